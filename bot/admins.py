@@ -0,0 +1,103 @@
+"""Admin registry backed by ADMINS_FILE.
+
+The ids are kept in memory and the file is re-read only when its mtime
+changes (checked at most every ADMINS_CHECK_INTERVAL seconds), so edits
+take effect without a restart.
+"""
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.types import BotCommand, BotCommandScopeChat
+
+from config import ADMINS_FILE, ADMINS_CHECK_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Default commands for all users
+USER_COMMANDS = [
+    BotCommand(command="start", description="Запустить бота"),
+    BotCommand(command="wants", description="Мои хочу"),
+    BotCommand(command="stats", description="Статистика"),
+    BotCommand(command="search", description="Поиск по целям"),
+    BotCommand(command="help", description="Помощь"),
+]
+
+# Admin commands
+ADMIN_COMMANDS = USER_COMMANDS + [
+    BotCommand(command="admin_stats", description="Статистика бота"),
+    BotCommand(command="admin_export", description="Экспорт данных"),
+    BotCommand(command="admin_metric", description="График активности"),
+]
+
+_admin_ids = frozenset()
+_mtime = None
+_checked_at = None
+# Admins whose chats currently have the admin command scope
+_scoped_ids = frozenset()
+
+
+def _read_admin_ids() -> frozenset:
+    admin_ids = set()
+    with open(ADMINS_FILE, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                admin_ids.add(int(line))
+            except ValueError:
+                logger.warning(f"Ignoring invalid admin id in {ADMINS_FILE.name}: {line!r}")
+    return frozenset(admin_ids)
+
+
+def get_admin_ids() -> frozenset:
+    global _admin_ids, _mtime, _checked_at
+
+    now = time.monotonic()
+    if _checked_at is not None and now - _checked_at < ADMINS_CHECK_INTERVAL:
+        return _admin_ids
+    _checked_at = now
+
+    try:
+        mtime = ADMINS_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+
+    if mtime != _mtime:
+        _admin_ids = _read_admin_ids() if mtime is not None else frozenset()
+        _mtime = mtime
+        logger.info(f"Admin list loaded: {len(_admin_ids)} admins")
+
+    return _admin_ids
+
+
+def is_admin(user_id: int) -> bool:
+    return user_id in get_admin_ids()
+
+
+async def sync_admin_commands(bot: Bot):
+    """Give new admins the admin command menu and take it from removed ones"""
+    global _scoped_ids
+
+    admin_ids = get_admin_ids()
+    if admin_ids == _scoped_ids:
+        return
+
+    scoped = set(_scoped_ids)
+    for admin_id in admin_ids - _scoped_ids:
+        try:
+            await bot.set_my_commands(ADMIN_COMMANDS, scope=BotCommandScopeChat(chat_id=admin_id))
+            scoped.add(admin_id)
+        except Exception as e:
+            logger.warning(f"Could not set commands for admin {admin_id}: {e}")
+
+    for admin_id in _scoped_ids - admin_ids:
+        try:
+            await bot.delete_my_commands(scope=BotCommandScopeChat(chat_id=admin_id))
+            scoped.discard(admin_id)
+        except Exception as e:
+            logger.warning(f"Could not reset commands for former admin {admin_id}: {e}")
+
+    _scoped_ids = frozenset(scoped)
+    logger.info("Admin commands synced")
@@ -0,0 +1,198 @@
+"""Concurrent, rate-limited delivery of scheduled messages.
+
+One Broadcaster is shared by all scheduler jobs, so its token bucket caps
+the bot's total outgoing rate even when two broadcasts overlap.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable, NamedTuple, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from config import (
+    BROADCAST_CONCURRENCY, BROADCAST_RATE_LIMIT,
+    BROADCAST_PER_CHAT_INTERVAL, BROADCAST_MAX_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+
+ResultCallback = Callable[["BroadcastMessage", Optional[Exception]], Awaitable[None]]
+
+
+class BroadcastMessage(NamedTuple):
+    chat_id: int
+    text: str
+    reply_markup: Any = None
+    parse_mode: Optional[str] = None
+
+
+@dataclass
+class BroadcastReport:
+    name: str
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    retries: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    duration: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.duration if self.duration > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Broadcast {self.name}: {self.sent}/{self.total} sent, {self.failed} failed, "
+            f"{self.retries} retries in {self.duration:.1f}s ({self.throughput:.1f} msg/s)"
+        )
+
+
+class TokenBucket:
+    """Global send rate limit; pause() stops all senders after a flood wait"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        # A capacity of 1 spreads sends evenly, bursts would overshoot
+        # Telegram's per-second window
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    async def acquire(self):
+        # The lock keeps waiters in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Broadcaster:
+    def __init__(
+        self,
+        bot: Bot,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        rate_limit: float = BROADCAST_RATE_LIMIT,
+        per_chat_interval: float = BROADCAST_PER_CHAT_INTERVAL,
+        max_retries: int = BROADCAST_MAX_RETRIES
+    ):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self._bucket = TokenBucket(rate_limit)
+        # chat_id -> earliest time the next message may go to that chat
+        self._chat_next_send = {}
+
+    async def run(
+        self,
+        name: str,
+        messages: AsyncIterable[BroadcastMessage],
+        on_result: ResultCallback = None
+    ) -> BroadcastReport:
+        """Send every message from the stream and report when done.
+
+        on_result is awaited after each message with the error that made it
+        fail, or None once it was delivered.
+        """
+        report = BroadcastReport(name=name)
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        workers = [
+            asyncio.create_task(self._worker(queue, report, on_result))
+            for _ in range(self.concurrency)
+        ]
+
+        try:
+            async for message in messages:
+                report.total += 1
+                await queue.put(message)
+
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            raise
+
+        report.duration = time.monotonic() - report.started_at
+        logger.info(str(report))
+        return report
+
+    async def _worker(self, queue: asyncio.Queue, report: BroadcastReport, on_result: ResultCallback):
+        while True:
+            message = await queue.get()
+            if message is None:
+                return
+
+            error = await self._send(message, report)
+            if error is None:
+                report.sent += 1
+            else:
+                report.failed += 1
+
+            if on_result is not None:
+                try:
+                    await on_result(message, error)
+                except Exception as e:
+                    logger.error(f"Result callback failed for {message.chat_id}: {e}")
+
+    async def _send(self, message: BroadcastMessage, report: BroadcastReport) -> Optional[Exception]:
+        kwargs = {}
+        if message.reply_markup is not None:
+            kwargs["reply_markup"] = message.reply_markup
+        if message.parse_mode is not None:
+            kwargs["parse_mode"] = message.parse_mode
+
+        for _ in range(self.max_retries + 1):
+            await self._wait_for_chat(message.chat_id)
+            await self._bucket.acquire()
+
+            try:
+                await self.bot.send_message(message.chat_id, message.text, **kwargs)
+                return None
+            except TelegramRetryAfter as e:
+                # Flood control applies to the whole bot, hold every sender
+                logger.warning(f"Flood wait {e.retry_after}s while sending to {message.chat_id}")
+                self._bucket.pause(e.retry_after)
+                report.retries += 1
+                error = e
+            except Exception as e:
+                logger.error(f"Failed to send broadcast message to {message.chat_id}: {e}")
+                return e
+
+        logger.error(f"Giving up on {message.chat_id} after {self.max_retries} retries")
+        return error
+
+    async def _wait_for_chat(self, chat_id: int):
+        now = time.monotonic()
+        next_send = self._chat_next_send.get(chat_id, 0.0)
+        self._chat_next_send[chat_id] = max(now, next_send) + self.per_chat_interval
+
+        if next_send > now:
+            await asyncio.sleep(next_send - now)
+
+        if len(self._chat_next_send) > self.concurrency * 100:
+            self._chat_next_send = {
+                chat: at for chat, at in self._chat_next_send.items() if at > now
+            }
@@ -0,0 +1,121 @@
+"""Admin charts rendered in a separate process.
+
+matplotlib is slow to import and to draw, and drawing holds the GIL, so
+charts are rendered in a process pool whose worker imports matplotlib once
+at start. PNGs are kept in a small cache keyed by the date range and the
+data, together with the Telegram file_id of the first upload, so an
+unchanged chart is neither redrawn nor uploaded again.
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Optional
+
+from config import CHART_WORKERS, CHART_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+# (start_date, end_date, data digest) -> _CachedChart
+_cache = OrderedDict()
+
+
+class _CachedChart:
+    __slots__ = ("png", "file_id")
+
+    def __init__(self, png: bytes):
+        self.png = png
+        # Set after the first upload, later requests send only the id
+        self.file_id = None
+
+
+def _warm_up():
+    # Runs once in each worker process. A failing initializer would break
+    # the pool, without matplotlib the render raises ImportError instead.
+    try:
+        import matplotlib
+    except ImportError:
+        return
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure  # noqa: F401
+
+
+def _render_activity(rows: list) -> bytes:
+    from matplotlib.figure import Figure
+
+    dates = [row[0] for row in rows]
+    users_count = [row[1] for row in rows]
+    goals_count = [row[2] for row in rows]
+
+    # Figure without pyplot: no global state, freed with the object
+    fig = Figure(figsize=(10, 8))
+    ax1, ax2 = fig.subplots(2, 1)
+
+    ax1.bar(dates, users_count, color='steelblue')
+    ax1.set_title('Пользователей с целями по дням')
+    ax1.tick_params(axis='x', rotation=45)
+
+    ax2.bar(dates, goals_count, color='coral')
+    ax2.set_title('Целей по дням')
+    ax2.tick_params(axis='x', rotation=45)
+
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=100)
+    return buffer.getvalue()
+
+
+def start():
+    """Start the pool and let the worker import matplotlib in the background"""
+    global _pool
+    if _pool is None:
+        # spawn: forking a process with running threads is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=CHART_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up
+        )
+        _pool.submit(int)
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _cache_key(start_date: date, end_date: date, rows: list) -> tuple:
+    digest = hashlib.blake2b(repr(rows).encode(), digest_size=16).digest()
+    return start_date, end_date, digest
+
+
+async def activity_chart(start_date: date, end_date: date, rows: list) -> _CachedChart:
+    """Cached chart of the rows; raises ImportError without matplotlib and
+    BrokenProcessPool if the worker died (the next call starts a new pool)"""
+    key = _cache_key(start_date, end_date, rows)
+    chart = _cache.get(key)
+    if chart is not None:
+        _cache.move_to_end(key)
+        return chart
+
+    start()
+    loop = asyncio.get_running_loop()
+    try:
+        png = await loop.run_in_executor(_pool, _render_activity, rows)
+    except BrokenProcessPool:
+        logger.error("Chart worker died, restarting the pool on the next chart")
+        shutdown()
+        raise
+
+    chart = _cache[key] = _CachedChart(png)
+    while len(_cache) > CHART_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return chart
@@ -9,6 +9,15 @@ DB_PATH = BASE_DIR / "app.db"
 LOGS_DIR = BASE_DIR / "logs"
 ADMINS_FILE = BOT_DIR / "admins.txt"
 ENV_FILE = BOT_DIR / ".env"
+# Seconds between checks whether ADMINS_FILE changed
+ADMINS_CHECK_INTERVAL = 5
+
+# SQLite tuning
+DB_BUSY_TIMEOUT_MS = 5000
+DB_CACHE_SIZE_KB = 16384
+DB_MMAP_SIZE = 256 * 1024 * 1024
+# Threads serving async DB calls (one keeps all writes on a single connection)
+DB_EXECUTOR_WORKERS = 1
 
 # Load .env
 load_dotenv(ENV_FILE)
@@ -17,8 +26,95 @@ load_dotenv(ENV_FILE)
 BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 TIMEZONE = os.getenv("TIMEZONE", "Europe/Moscow")
 
+# Update delivery: "polling" or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Public base URL Telegram posts to; empty serves local requests only
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Required with WEBHOOK_URL, Telegram sends it with every update
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Local only by default, the public side is the reverse proxy
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Updates processed at once; further requests wait for a free slot
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "100"))
+# Parallel connections Telegram may open (1-100)
+WEBHOOK_MAX_CONNECTIONS = 40
+# Seconds in-flight updates get to finish on shutdown
+WEBHOOK_SHUTDOWN_TIMEOUT = 10
+
 # Reminder times (HH:MM)
 REMINDER_TIMES = ["09:00", "12:00", "17:00", "19:00", "21:00", "23:00"]
+EVENING_REMINDER_TIME = "23:01"
+
+# Broadcasts (Telegram allows about 30 messages per second in total)
+BROADCAST_CONCURRENCY = 10
+BROADCAST_RATE_LIMIT = 28
+BROADCAST_PER_CHAT_INTERVAL = 1.0
+BROADCAST_MAX_RETRIES = 3
+# Outbox rows claimed per query; a crash may drop at most this many messages
+OUTBOX_CLAIM_SIZE = 50
+# Unfinished or missed broadcasts younger than this are resumed on startup
+BROADCAST_RESUME_GRACE_MINUTES = 60
+OUTBOX_RETENTION_DAYS = 7
+# Consecutive rejected deliveries after which a user is treated as unreachable
+DELIVERY_MAX_FAILURES = 5
+
+# Users whose goals and active wishes are cached per process, off by
+# default. Another worker's writes become visible only after USER_CACHE_TTL
+# seconds, so enable it only when a single worker serves the database.
+USER_CACHE_SIZE = 20000
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "0"))
+
+# Parameterized keyboards kept per keyboard function
+KEYBOARD_CACHE_SIZE = 1024
+
+# Updates of one user queued at once, more are dropped
+USER_QUEUE_LIMIT = 10
+
+# Throttling: (burst, tokens per second) per user over all handlers and
+# per user for single handlers; THROTTLE_TABLE_SIZE bounds the buckets kept
+THROTTLE_USER = (8, 2.0)
+THROTTLE_HANDLERS = {
+    "goal_today": (3, 0.5),
+    "goal_today_callback": (3, 0.5),
+    "goal_tomorrow": (3, 0.5),
+    "show_stats": (2, 0.2),
+    "search": (3, 0.3),
+    "search_page": (5, 0.5),
+    "admin_export": (1, 1 / 60),
+    "admin_metric": (1, 1 / 10),
+}
+THROTTLE_TABLE_SIZE = 50000
+
+# FSM storage: dialogs abandoned this long are dropped
+FSM_STATE_TTL_HOURS = 24
+# Write-through cache of FSM records per process, off by default. Another
+# worker's writes become visible only after FSM_CACHE_TTL seconds, so
+# enable it only when all updates of a user reach the same worker.
+FSM_CACHE_SIZE = 10000
+FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", "0"))
+
+# Minutes between refreshes of today's admin metrics
+METRICS_REFRESH_MINUTES = 10
+
+# Chart rendering processes and rendered charts kept
+CHART_WORKERS = 1
+CHART_CACHE_SIZE = 16
+
+# Admin export: rows fetched per batch and gzip level of the CSV files
+EXPORT_BATCH_SIZE = 5000
+EXPORT_COMPRESS_LEVEL = 6
+
+# Active wishes a user may have, the default wish not counted
+MAX_ACTIVE_WISHES = 2
+
+# Done goals per page of a wish's history
+HISTORY_PAGE_SIZE = 20
+
+# Hits per page of /search; shorter words are not matched as prefixes
+SEARCH_PAGE_SIZE = 5
+SEARCH_MIN_PREFIX = 3
 
 # Goal edit deadline (hours after midnight)
 GOAL_EDIT_DEADLINE_HOUR = 3
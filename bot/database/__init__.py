@@ -1,9 +1,11 @@
-from .db import init_db, get_connection
+from .db import init_db, get_connection, transaction, close_connections
 from .users import get_or_create_user, get_user
 from .goals import (
     create_goal,
     get_goal_for_date,
     get_goal_by_id,
+    get_goal_view,
+    get_goal_view_for_date,
     update_goal_status,
     update_goal_text,
     delete_goal,
@@ -11,6 +13,7 @@ from .goals import (
     add_reflection,
     get_days_with_completed_goals
 )
+from .daily_metrics import get_bot_stats, get_daily_activity
 from .wishes import (
     create_wish,
     get_active_wishes,
@@ -21,14 +24,18 @@ from .wishes import (
     delete_wish,
     count_active_wishes,
     set_wish_family,
-    get_goals_by_wish
+    get_goals_by_wish,
+    count_done_goals_by_wish,
+    get_wish_history_page
 )
 from .families import (
     create_family,
     get_families,
+    get_family_summaries,
     get_family,
     update_family_name,
     delete_family,
     get_wishes_in_family,
     get_goals_by_family
 )
+from .search import search_goals
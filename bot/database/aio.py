@@ -0,0 +1,98 @@
+"""Awaitable versions of the data functions.
+
+Every call runs on the dedicated DB executor, so handlers and scheduler
+jobs never block the event loop while SQLite waits for I/O or a lock.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DB_EXECUTOR_WORKERS
+from . import db, users, goals, daily_metrics, wishes, families, outbox, fsm, search
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a synchronous database function on the DB executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def _awaitable(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+    return wrapper
+
+
+def shutdown():
+    _executor.shutdown(wait=True)
+    db.close_connections()
+
+
+# Users
+get_or_create_user = _awaitable(users.get_or_create_user)
+get_user = _awaitable(users.get_user)
+
+# Goals
+create_goal = _awaitable(goals.create_goal)
+get_goal_for_date = _awaitable(goals.get_goal_for_date)
+get_goal_by_id = _awaitable(goals.get_goal_by_id)
+get_goal_view = _awaitable(goals.get_goal_view)
+get_goal_view_for_date = _awaitable(goals.get_goal_view_for_date)
+update_goal_status = _awaitable(goals.update_goal_status)
+update_goal_text = _awaitable(goals.update_goal_text)
+delete_goal = _awaitable(goals.delete_goal)
+get_user_stats = _awaitable(goals.get_user_stats)
+add_reflection = _awaitable(goals.add_reflection)
+get_days_with_completed_goals = _awaitable(goals.get_days_with_completed_goals)
+get_pending_goals_for_date = _awaitable(goals.get_pending_goals_for_date)
+close_day = _awaitable(goals.close_day)
+
+# Daily metrics
+refresh_day_metrics = _awaitable(daily_metrics.refresh_day)
+get_bot_stats = _awaitable(daily_metrics.get_bot_stats)
+get_daily_activity = _awaitable(daily_metrics.get_daily_activity)
+
+# Broadcast outbox
+plan_batch = _awaitable(outbox.plan_batch)
+get_batch = _awaitable(outbox.get_batch)
+get_unfinished_batches = _awaitable(outbox.get_unfinished_batches)
+claim_recipients = _awaitable(outbox.claim_recipients)
+mark_outbox = _awaitable(outbox.mark_outbox)
+complete_batch = _awaitable(outbox.complete_batch)
+prune_batches = _awaitable(outbox.prune_batches)
+
+# Wishes
+create_wish = _awaitable(wishes.create_wish)
+get_active_wishes = _awaitable(wishes.get_active_wishes)
+get_all_wishes = _awaitable(wishes.get_all_wishes)
+get_wish = _awaitable(wishes.get_wish)
+update_wish_status = _awaitable(wishes.update_wish_status)
+update_wish_text = _awaitable(wishes.update_wish_text)
+delete_wish = _awaitable(wishes.delete_wish)
+count_active_wishes = _awaitable(wishes.count_active_wishes)
+set_wish_family = _awaitable(wishes.set_wish_family)
+get_goals_by_wish = _awaitable(wishes.get_goals_by_wish)
+count_done_goals_by_wish = _awaitable(wishes.count_done_goals_by_wish)
+get_wish_history_page = _awaitable(wishes.get_wish_history_page)
+
+# Families
+create_family = _awaitable(families.create_family)
+get_families = _awaitable(families.get_families)
+get_family_summaries = _awaitable(families.get_family_summaries)
+get_family = _awaitable(families.get_family)
+update_family_name = _awaitable(families.update_family_name)
+delete_family = _awaitable(families.delete_family)
+get_wishes_in_family = _awaitable(families.get_wishes_in_family)
+get_goals_by_family = _awaitable(families.get_goals_by_family)
+
+# FSM storage
+get_fsm_record = _awaitable(fsm.get_fsm_record)
+set_fsm_state = _awaitable(fsm.set_fsm_state)
+set_fsm_data = _awaitable(fsm.set_fsm_data)
+purge_fsm_states = _awaitable(fsm.purge_fsm_states)
+
+# Search
+search_goals = _awaitable(search.search_goals)
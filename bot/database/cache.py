@@ -0,0 +1,141 @@
+"""Read-through cache of each user's goals by date and active wishes.
+
+Entries are kept per user in an LRU of USER_CACHE_SIZE users and dropped
+when the day changes or USER_CACHE_TTL seconds after they were created
+(a TTL of 0 disables the cache). Write functions invalidate exactly the entries they
+touch once their transaction has committed (db.after_commit); a read that
+raced with a write is not stored, so the cache never keeps a stale row.
+Reads inside a write transaction bypass the cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from config import USER_CACHE_SIZE, USER_CACHE_TTL
+from .db import after_commit
+
+_lock = threading.Lock()
+# user_id -> _UserEntry
+_users = OrderedDict()
+_day = None
+# Bumped by every invalidation, a read stores its result only if unchanged
+_generation = 0
+_hits = 0
+_misses = 0
+
+# Marks a value that is not cached (None is a cached "no goal")
+MISSING = object()
+
+
+class _UserEntry:
+    __slots__ = ("goals", "wishes", "expires")
+
+    def __init__(self):
+        # goal_date -> GoalView or None
+        self.goals = {}
+        self.wishes = MISSING
+        self.expires = time.monotonic() + USER_CACHE_TTL
+
+
+def _entry(user_id: int, create: bool = False):
+    """Caller holds _lock"""
+    global _day
+    today = date.today()
+    if today != _day:
+        _users.clear()
+        _day = today
+
+    entry = _users.get(user_id)
+    if entry is not None and entry.expires <= time.monotonic():
+        # Another worker may have changed the user's rows since
+        del _users[user_id]
+        entry = None
+
+    if entry is not None:
+        _users.move_to_end(user_id)
+    elif create:
+        entry = _users[user_id] = _UserEntry()
+        while len(_users) > USER_CACHE_SIZE:
+            _users.popitem(last=False)
+    return entry
+
+
+def _count(value):
+    global _hits, _misses
+    if value is MISSING:
+        _misses += 1
+    else:
+        _hits += 1
+    return value
+
+
+def generation() -> int:
+    return _generation
+
+
+def get_goal(user_id: int, goal_date: date):
+    with _lock:
+        entry = _entry(user_id)
+        return _count(entry.goals.get(goal_date, MISSING) if entry else MISSING)
+
+
+def store_goal(user_id: int, goal_date: date, goal, read_generation: int):
+    with _lock:
+        if USER_CACHE_TTL > 0 and read_generation == _generation:
+            _entry(user_id, create=True).goals[goal_date] = goal
+
+
+def get_wishes(user_id: int):
+    with _lock:
+        entry = _entry(user_id)
+        return _count(entry.wishes if entry else MISSING)
+
+
+def store_wishes(user_id: int, wishes: tuple, read_generation: int):
+    with _lock:
+        if USER_CACHE_TTL > 0 and read_generation == _generation:
+            _entry(user_id, create=True).wishes = wishes
+
+
+def _invalidate(drop):
+    def run():
+        global _generation
+        with _lock:
+            _generation += 1
+            drop()
+    after_commit(run)
+
+
+def invalidate_goal(user_id: int, goal_date):
+    if isinstance(goal_date, str):
+        goal_date = date.fromisoformat(goal_date)
+
+    def drop():
+        entry = _users.get(user_id)
+        if entry is not None:
+            entry.goals.pop(goal_date, None)
+    _invalidate(drop)
+
+
+def invalidate_goals_on(goal_date: date):
+    def drop():
+        for entry in _users.values():
+            entry.goals.pop(goal_date, None)
+    _invalidate(drop)
+
+
+def invalidate_wishes(user_id: int, goals: bool = False):
+    """Drop the active wishes, and with goals=True every goal (wish text changed)"""
+    def drop():
+        entry = _users.get(user_id)
+        if entry is not None:
+            entry.wishes = MISSING
+            if goals:
+                entry.goals.clear()
+    _invalidate(drop)
+
+
+def metrics() -> dict:
+    with _lock:
+        return {"users": len(_users), "hits": _hits, "misses": _misses}
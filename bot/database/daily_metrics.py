@@ -0,0 +1,130 @@
+"""Per-day rollup of goal and user counts for the admin commands.
+
+A day's row is computed from that day's goals and new users only (index
+range scans), so its cost does not grow with history. close_day writes the
+final row of a day; today's row is refreshed by a scheduler job. Days are
+local dates, like goal_date; the all-time totals of get_bot_stats are read
+from users and user_stats instead (goals until user_stats is backfilled),
+as they also cover future goals and deletions.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+
+from .db import get_connection, transaction
+
+# Days rolled up per transaction by the backfill
+BACKFILL_DAYS_PER_BATCH = 30
+
+
+def _utc_bound(day: date) -> str:
+    """Local midnight starting day, as a UTC first_seen_at value"""
+    return datetime.combine(day, time()).astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def rollup_day(cursor, day: date):
+
+    cursor.execute(
+        """SELECT COUNT(*), COALESCE(SUM(status = 'done'), 0), COALESCE(SUM(status = 'failed'), 0),
+                  COUNT(DISTINCT user_id)
+           FROM goals WHERE goal_date = ?""",
+        (day.isoformat(),)
+    )
+    goals_set, goals_done, goals_failed, active_users = cursor.fetchone()
+
+    # first_seen_at is "YYYY-MM-DD HH:MM:SS" in UTC (CURRENT_TIMESTAMP), so the
+    # local day is the string range between the UTC times of its midnights
+    cursor.execute(
+        "SELECT COUNT(*) FROM users WHERE first_seen_at >= ? AND first_seen_at < ?",
+        (_utc_bound(day), _utc_bound(day + timedelta(days=1)))
+    )
+    new_users = cursor.fetchone()[0]
+
+    cursor.execute(
+        """INSERT OR REPLACE INTO daily_metrics
+               (metric_date, goals_set, goals_done, goals_failed, active_users, new_users, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (day.isoformat(), goals_set, goals_done, goals_failed, active_users, new_users, datetime.now())
+    )
+
+
+def refresh_day(day: date):
+    with transaction() as cursor:
+        rollup_day(cursor, day)
+
+
+def backfill_daily_metrics() -> int:
+    """Recompute every day from the first goal or user up to today, returns the days"""
+    conn = get_connection()
+    first_goal, first_user = conn.execute(
+        "SELECT (SELECT MIN(goal_date) FROM goals), (SELECT MIN(first_seen_at) FROM users)"
+    ).fetchone()
+    starts = []
+    if first_goal:
+        starts.append(date.fromisoformat(first_goal))
+    if first_user:
+        # UTC timestamp, may fall on the previous or next local day
+        first_seen = datetime.fromisoformat(first_user).replace(tzinfo=timezone.utc)
+        starts.append(first_seen.astimezone().date())
+    if not starts:
+        return 0
+
+    day = min(starts)
+    today = date.today()
+    count = 0
+    while day <= today:
+        with transaction() as cursor:
+            for _ in range(BACKFILL_DAYS_PER_BATCH):
+                if day > today:
+                    break
+                rollup_day(cursor, day)
+                day += timedelta(days=1)
+                count += 1
+
+    return count
+
+
+def get_bot_stats():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT COUNT(*) FROM users")
+    total_users = cursor.fetchone()[0]
+
+    cursor.execute("SELECT complete FROM user_stats_state")
+    if cursor.fetchone()[0]:
+        # One row per user with goals, kept exact by the goal write functions
+        cursor.execute("SELECT COALESCE(SUM(total_goals), 0), COALESCE(SUM(done_count), 0) FROM user_stats")
+    else:
+        # Rows are still missing (upgraded, not backfilled): scan the goals index
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(status = 'done'), 0) FROM goals")
+    total_goals, done_goals = cursor.fetchone()
+
+    cursor.execute(
+        "SELECT goals_set FROM daily_metrics WHERE metric_date = ?",
+        (date.today().isoformat(),)
+    )
+    row = cursor.fetchone()
+    goals_today = row[0] if row else 0
+
+    return {
+        "total_users": total_users,
+        "total_goals": total_goals,
+        "goals_today": goals_today,
+        "done_goals": done_goals
+    }
+
+
+def get_daily_activity(start_date: date, end_date: date):
+    """(goal_date, users with goals, goals) per day in the range"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """SELECT metric_date, active_users, goals_set
+           FROM daily_metrics
+           WHERE metric_date >= ? AND metric_date <= ? AND goals_set > 0
+           ORDER BY metric_date""",
+        (start_date.isoformat(), end_date.isoformat())
+    )
+    data = cursor.fetchall()
+
+    return data
@@ -1,67 +1,150 @@
 import sqlite3
-from config import DB_PATH
+import threading
+from contextlib import contextmanager
+from config import DB_PATH, DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE
+
+# Connections are kept open for the lifetime of the thread that created them
+# (sqlite3 connections must not be shared between threads).
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+
+
+def _connect():
+    # isolation_level=None: autocommit for single statements, explicit
+    # BEGIN/COMMIT through transaction() for writes
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        check_same_thread=False
+    )
+
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA cache_size = -{int(DB_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+    return conn
 
 
 def get_connection():
-    return sqlite3.connect(DB_PATH)
+    """Return the calling thread's connection, opening it on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _connect()
+        _local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
 
 
-def init_db():
+@contextmanager
+def transaction():
+    """Run a block of writes in one transaction and yield a cursor.
+
+    Nested calls join the outer transaction, so data functions can be
+    combined without committing halfway.
+    """
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            first_name TEXT,
-            first_seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS wish_families (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(user_id)
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS wishes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            text TEXT NOT NULL,
-            status TEXT DEFAULT 'active',
-            family_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            archived_at TIMESTAMP,
-            position INTEGER DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users(user_id),
-            FOREIGN KEY (family_id) REFERENCES wish_families(id)
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS goals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            goal_date DATE NOT NULL,
-            goal_text TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP,
-            locked_after_done INTEGER DEFAULT 0,
-            wish_id INTEGER,
-            family_id_snapshot INTEGER,
-            reflection_text TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(user_id),
-            FOREIGN KEY (wish_id) REFERENCES wishes(id),
-            UNIQUE(user_id, goal_date)
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    if conn.in_transaction:
+        yield cursor
+        return
+
+    _local.after_commit = []
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        yield cursor
+    except BaseException:
+        conn.rollback()
+        _local.after_commit = None
+        raise
+    else:
+        conn.commit()
+        callbacks, _local.after_commit = _local.after_commit, None
+        for callback in callbacks:
+            callback()
+
+
+def after_commit(callback):
+    """Run callback once the current transaction has committed.
+
+    Outside a transaction it runs at once; on rollback it is dropped.
+    """
+    callbacks = getattr(_local, "after_commit", None)
+    if callbacks is None:
+        callback()
+    else:
+        callbacks.append(callback)
+
+
+def close_connections():
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+    _local.__dict__.clear()
+
+
+def init_db():
+    with transaction() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                first_name TEXT,
+                first_seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS wish_families (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(user_id)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS wishes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                status TEXT DEFAULT 'active',
+                family_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                archived_at TIMESTAMP,
+                position INTEGER DEFAULT 0,
+                FOREIGN KEY (user_id) REFERENCES users(user_id),
+                FOREIGN KEY (family_id) REFERENCES wish_families(id)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS goals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                goal_date DATE NOT NULL,
+                goal_text TEXT NOT NULL,
+                status TEXT DEFAULT 'pending',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                completed_at TIMESTAMP,
+                locked_after_done INTEGER DEFAULT 0,
+                wish_id INTEGER,
+                family_id_snapshot INTEGER,
+                reflection_text TEXT,
+                FOREIGN KEY (user_id) REFERENCES users(user_id),
+                FOREIGN KEY (wish_id) REFERENCES wishes(id),
+                UNIQUE(user_id, goal_date)
+            )
+        """)
+
+    # Local import: migrations depends on this module
+    from .migrations import migrate
+    migrate()
@@ -0,0 +1,98 @@
+"""Streaming CSV export of the whole database.
+
+Each table is written as a gzipped CSV, fetched in batches and compressed
+on the fly, so memory stays flat however many rows there are. The export
+opens its own connection and reads all tables in one transaction, so the
+files are a consistent snapshot and the DB executor is not held up.
+
+Goals can also be exported incrementally: every insert, update and delete
+takes the next value of change_counter (see the goal change tracking
+migration), so the rows changed after a watermark are an index range scan.
+Goals untouched since the migration have no change_seq and are exported
+as changed at their id; the counter started above every such id.
+"""
+import csv
+import gzip
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Tuple
+
+from config import EXPORT_BATCH_SIZE, EXPORT_COMPRESS_LEVEL
+from .db import _connect
+
+EXPORT_TABLES = ("users", "wish_families", "wishes", "goals")
+
+# Rows changed after a watermark. The first part (rowid range) covers goals
+# from before change tracking with their seeded values, the second part
+# the partial change_seq index.
+_GOAL_CHANGES_QUERY = """
+    SELECT id, user_id, goal_date, goal_text, status, created_at, completed_at,
+           locked_after_done, wish_id, family_id_snapshot, reflection_text,
+           COALESCE(completed_at, created_at) AS updated_at, id AS change_seq
+    FROM goals WHERE id > :since AND change_seq IS NULL
+    UNION ALL
+    SELECT id, user_id, goal_date, goal_text, status, created_at, completed_at,
+           locked_after_done, wish_id, family_id_snapshot, reflection_text,
+           updated_at, change_seq
+    FROM goals WHERE change_seq > :since
+    ORDER BY change_seq"""
+
+
+def _write_query(cursor, path: Path, query: str, params=()):
+    cursor.execute(query, params)
+    with gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=EXPORT_COMPRESS_LEVEL) as f:
+        writer = csv.writer(f)
+        # Header from the query itself, so it always matches the columns
+        writer.writerow([column[0] for column in cursor.description])
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            writer.writerows(rows)
+
+
+@contextmanager
+def _snapshot():
+    """Cursor of a private connection inside one read transaction"""
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        yield cursor
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def export_tables(directory: Path) -> List[Path]:
+    """Write <table>.csv.gz for every exported table into directory"""
+    files = []
+    with _snapshot() as cursor:
+        for table in EXPORT_TABLES:
+            path = directory / f"{table}.csv.gz"
+            _write_query(cursor, path, f"SELECT * FROM {table} ORDER BY rowid")
+            files.append(path)
+    return files
+
+
+def export_goal_changes(directory: Path, since: int) -> Tuple[List[Path], int]:
+    """Write the goals changed and deleted after watermark since.
+
+    Returns the files and the new watermark to pass next time. Rows are
+    ordered by change_seq; a goal changed several times appears once,
+    with its latest values.
+    """
+    with _snapshot() as cursor:
+        watermark = cursor.execute("SELECT value FROM change_counter").fetchone()[0]
+
+        changed = directory / "goals_changed.csv.gz"
+        _write_query(cursor, changed, _GOAL_CHANGES_QUERY, {"since": since})
+
+        deleted = directory / "goals_deleted.csv.gz"
+        _write_query(
+            cursor, deleted,
+            "SELECT goal_id, change_seq, deleted_at FROM goal_deletions WHERE change_seq > ? ORDER BY change_seq",
+            (since,)
+        )
+
+    return [changed, deleted], watermark
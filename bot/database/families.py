@@ -1,35 +1,56 @@
-from .db import get_connection
+from .db import get_connection, transaction
+from . import cache
+from .models import FamilySummary
 
 
 def create_family(user_id: int, name: str):
+    with transaction() as cursor:
+        cursor.execute(
+            "INSERT INTO wish_families (user_id, name) VALUES (?, ?)",
+            (user_id, name)
+        )
+
+    return cursor.lastrowid
+
+
+def get_families(user_id: int):
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute(
-        "INSERT INTO wish_families (user_id, name) VALUES (?, ?)",
-        (user_id, name)
+        "SELECT * FROM wish_families WHERE user_id = ? ORDER BY created_at",
+        (user_id,)
     )
+    families = cursor.fetchall()
 
-    conn.commit()
-    family_id = cursor.lastrowid
-    conn.close()
-    return family_id
+    return families
 
 
-def get_families(user_id: int):
+def get_family_summaries(user_id: int):
+    """Families with their wish and done-goal counters, one indexed query"""
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute(
-        "SELECT * FROM wish_families WHERE user_id = ? ORDER BY created_at",
+        """SELECT id, name, wish_count, done_goals FROM wish_families
+           WHERE user_id = ? ORDER BY created_at""",
         (user_id,)
     )
-    families = cursor.fetchall()
+    families = [FamilySummary(*row) for row in cursor.fetchall()]
 
-    conn.close()
     return families
 
 
+def rebuild_family_counters(cursor):
+    """Recompute every family's counters, inside the caller's transaction"""
+    cursor.execute(
+        """UPDATE wish_families SET
+               wish_count = (SELECT COUNT(*) FROM wishes WHERE family_id = wish_families.id),
+               done_goals = (SELECT COUNT(*) FROM goals JOIN wishes ON goals.wish_id = wishes.id
+                             WHERE wishes.family_id = wish_families.id AND goals.status = 'done')"""
+    )
+
+
 def get_family(family_id: int):
     conn = get_connection()
     cursor = conn.cursor()
@@ -37,37 +58,31 @@ def get_family(family_id: int):
     cursor.execute("SELECT * FROM wish_families WHERE id = ?", (family_id,))
     family = cursor.fetchone()
 
-    conn.close()
     return family
 
 
 def update_family_name(family_id: int, name: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "UPDATE wish_families SET name = ? WHERE id = ?",
-        (name, family_id)
-    )
-
-    conn.commit()
-    conn.close()
+    with transaction() as cursor:
+        cursor.execute(
+            "UPDATE wish_families SET name = ? WHERE id = ?",
+            (name, family_id)
+        )
 
 
 def delete_family(family_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Remove family_id from wishes
-    cursor.execute(
-        "UPDATE wishes SET family_id = NULL WHERE family_id = ?",
-        (family_id,)
-    )
+    with transaction() as cursor:
+        cursor.execute("SELECT user_id FROM wish_families WHERE id = ?", (family_id,))
+        family = cursor.fetchone()
 
-    cursor.execute("DELETE FROM wish_families WHERE id = ?", (family_id,))
+        # Remove family_id from wishes
+        cursor.execute(
+            "UPDATE wishes SET family_id = NULL WHERE family_id = ?",
+            (family_id,)
+        )
 
-    conn.commit()
-    conn.close()
+        cursor.execute("DELETE FROM wish_families WHERE id = ?", (family_id,))
+        if family:
+            cache.invalidate_wishes(family[0])
 
 
 def get_wishes_in_family(family_id: int):
@@ -80,7 +95,6 @@ def get_wishes_in_family(family_id: int):
     )
     wishes = cursor.fetchall()
 
-    conn.close()
     return wishes
 
 
@@ -97,5 +111,4 @@ def get_goals_by_family(family_id: int):
     )
     goals = cursor.fetchall()
 
-    conn.close()
     return goals
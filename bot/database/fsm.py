@@ -0,0 +1,59 @@
+"""FSM states and data of in-flight dialogs, see fsm_storage.py.
+
+Every write moves a row's expires_at (unix time) forward; expired rows
+read as missing and are deleted by purge_fsm_states.
+"""
+import time
+from .db import get_connection, transaction
+
+
+def get_fsm_record(key: str):
+    """(state, data) of a key, None if missing or expired"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "SELECT state, data FROM fsm_states WHERE key = ? AND expires_at > ?",
+        (key, time.time())
+    )
+    record = cursor.fetchone()
+
+    return record
+
+
+def _set_fsm_column(column: str, key: str, value, expires_at: float):
+    with transaction() as cursor:
+        if value is None:
+            cursor.execute(f"UPDATE fsm_states SET {column} = NULL WHERE key = ?", (key,))
+            # Nothing left to keep
+            cursor.execute("DELETE FROM fsm_states WHERE key = ? AND state IS NULL AND data IS NULL", (key,))
+            return
+
+        # An expired row not purged yet must not bring its other column back
+        other = "data" if column == "state" else "state"
+        cursor.execute(
+            f"""INSERT INTO fsm_states (key, {column}, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    {column} = excluded.{column},
+                    {other} = CASE WHEN fsm_states.expires_at <= ? THEN NULL ELSE fsm_states.{other} END,
+                    expires_at = excluded.expires_at""",
+            (key, value, expires_at, time.time())
+        )
+
+
+def set_fsm_state(key: str, state: str, expires_at: float):
+    _set_fsm_column("state", key, state, expires_at)
+
+
+def set_fsm_data(key: str, data: str, expires_at: float):
+    """data: encoded data, None when empty"""
+    _set_fsm_column("data", key, data, expires_at)
+
+
+def purge_fsm_states() -> int:
+    """Delete expired rows, returns the number deleted"""
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM fsm_states WHERE expires_at <= ?", (time.time(),))
+        count = cursor.rowcount
+
+    return count
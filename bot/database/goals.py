@@ -1,21 +1,44 @@
 from datetime import datetime, date
-from .db import get_connection
+from .db import get_connection, transaction
+from . import cache
+from .models import GoalView
+from .user_stats import apply_goal_change, get_user_stats_row
+from .daily_metrics import rollup_day
+
+
+def create_goal(user_id: int, goal_date: date, goal_text: str, wish_id: int = None):
+    """Set the user's goal for goal_date, returns it as a GoalView.
+
+    An existing goal for the date is overwritten in place by the UPSERT,
+    keeping its id, and the family snapshot is read from the wish in the
+    same statement.
+    """
+    with transaction() as cursor:
+        # The stats need the replaced goal's status, RETURNING only sees the new row
+        cursor.execute(
+            "SELECT status FROM goals WHERE user_id = ? AND goal_date = ?",
+            (user_id, goal_date.isoformat())
+        )
+        replaced = cursor.fetchone()
+
+        # WHERE true keeps the parser from reading ON CONFLICT as a join constraint
+        cursor.execute(
+            """INSERT INTO goals (user_id, goal_date, goal_text, status, created_at, wish_id, family_id_snapshot)
+               SELECT ?, ?, ?, 'pending', ?, ?, (SELECT family_id FROM wishes WHERE id = ?) WHERE true
+               ON CONFLICT (user_id, goal_date) DO UPDATE SET
+                   goal_text = excluded.goal_text, status = 'pending', created_at = excluded.created_at,
+                   completed_at = NULL, locked_after_done = 0, wish_id = excluded.wish_id,
+                   family_id_snapshot = excluded.family_id_snapshot, reflection_text = NULL
+               RETURNING id, user_id, goal_date, goal_text, status, reflection_text, wish_id,
+                         (SELECT text FROM wishes WHERE wishes.id = goals.wish_id)""",
+            (user_id, goal_date.isoformat(), goal_text, datetime.now(), wish_id, wish_id)
+        )
+        goal = _goal_view(cursor.fetchone())
+
+        apply_goal_change(cursor, user_id, goal_date.isoformat(), replaced[0] if replaced else None, "pending")
+        cache.invalidate_goal(user_id, goal_date)
 
-
-def create_goal(user_id: int, goal_date: date, goal_text: str, wish_id: int = None, family_id_snapshot: int = None):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """INSERT OR REPLACE INTO goals (user_id, goal_date, goal_text, status, created_at, wish_id, family_id_snapshot)
-           VALUES (?, ?, ?, 'pending', ?, ?, ?)""",
-        (user_id, goal_date.isoformat(), goal_text, datetime.now(), wish_id, family_id_snapshot)
-    )
-
-    conn.commit()
-    goal_id = cursor.lastrowid
-    conn.close()
-    return goal_id
+    return goal
 
 
 def get_goal_for_date(user_id: int, goal_date: date):
@@ -28,108 +51,113 @@ def get_goal_for_date(user_id: int, goal_date: date):
     )
     goal = cursor.fetchone()
 
-    conn.close()
     return goal
 
 
-def update_goal_status(goal_id: int, status: str):
+_GOAL_VIEW_QUERY = """SELECT goals.id, goals.user_id, goals.goal_date, goals.goal_text, goals.status,
+                            goals.reflection_text, goals.wish_id, wishes.text
+                     FROM goals LEFT JOIN wishes ON wishes.id = goals.wish_id"""
+
+
+def _goal_view(row):
+    if row is None:
+        return None
+    return GoalView(row[0], row[1], date.fromisoformat(row[2]), *row[3:])
+
+
+def get_goal_view(goal_id: int):
+    """Goal joined with its wish text, one query"""
     conn = get_connection()
     cursor = conn.cursor()
 
-    completed_at = datetime.now() if status == "done" else None
-    locked = 1 if status == "done" else 0
+    cursor.execute(f"{_GOAL_VIEW_QUERY} WHERE goals.id = ?", (goal_id,))
+    goal = _goal_view(cursor.fetchone())
 
-    cursor.execute(
-        "UPDATE goals SET status = ?, completed_at = ?, locked_after_done = ? WHERE id = ?",
-        (status, completed_at, locked, goal_id)
-    )
-
-    conn.commit()
-    conn.close()
+    return goal
 
 
-def update_goal_text(goal_id: int, new_text: str):
+def get_goal_view_for_date(user_id: int, goal_date: date):
+    """Read through the per-user cache, see cache.py"""
     conn = get_connection()
     cursor = conn.cursor()
 
+    use_cache = not conn.in_transaction
+    if use_cache:
+        goal = cache.get_goal(user_id, goal_date)
+        if goal is not cache.MISSING:
+            return goal
+        read_generation = cache.generation()
+
     cursor.execute(
-        "UPDATE goals SET goal_text = ? WHERE id = ?",
-        (new_text, goal_id)
+        f"{_GOAL_VIEW_QUERY} WHERE goals.user_id = ? AND goals.goal_date = ?",
+        (user_id, goal_date.isoformat())
     )
+    goal = _goal_view(cursor.fetchone())
 
-    conn.commit()
-    conn.close()
+    if use_cache:
+        cache.store_goal(user_id, goal_date, goal, read_generation)
+    return goal
 
 
-def delete_goal(goal_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
+def update_goal_status(goal_id: int, status: str):
+    completed_at = datetime.now() if status == "done" else None
+    locked = 1 if status == "done" else 0
 
-    cursor.execute("DELETE FROM goals WHERE id = ?", (goal_id,))
+    with transaction() as cursor:
+        cursor.execute("SELECT user_id, goal_date, status FROM goals WHERE id = ?", (goal_id,))
+        goal = cursor.fetchone()
+        if not goal:
+            return
 
-    conn.commit()
-    conn.close()
+        cursor.execute(
+            "UPDATE goals SET status = ?, completed_at = ?, locked_after_done = ? WHERE id = ?",
+            (status, completed_at, locked, goal_id)
+        )
 
+        user_id, goal_date, old_status = goal
+        apply_goal_change(cursor, user_id, goal_date, old_status, status)
+        cache.invalidate_goal(user_id, goal_date)
 
-def get_user_stats(user_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
 
-    # Days in system
-    cursor.execute(
-        "SELECT first_seen_at FROM users WHERE user_id = ?",
-        (user_id,)
-    )
-    result = cursor.fetchone()
-    if result and result[0]:
-        first_seen = datetime.fromisoformat(result[0])
-        days_total = (datetime.now() - first_seen).days + 1
-    else:
-        days_total = 1
+def update_goal_text(goal_id: int, new_text: str):
+    with transaction() as cursor:
+        cursor.execute(
+            "UPDATE goals SET goal_text = ? WHERE id = ? RETURNING user_id, goal_date",
+            (new_text, goal_id)
+        )
+        goal = cursor.fetchone()
+        if goal:
+            cache.invalidate_goal(*goal)
 
-    # Goals stats
-    cursor.execute(
-        "SELECT COUNT(*) FROM goals WHERE user_id = ?",
-        (user_id,)
-    )
-    days_with_goals = cursor.fetchone()[0]
 
-    cursor.execute(
-        "SELECT COUNT(*) FROM goals WHERE user_id = ? AND status = 'done'",
-        (user_id,)
-    )
-    goals_done = cursor.fetchone()[0]
+def delete_goal(goal_id: int):
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM goals WHERE id = ? RETURNING user_id, goal_date, status", (goal_id,))
+        goal = cursor.fetchone()
+        if not goal:
+            return
 
-    done_percent = round(goals_done / days_with_goals * 100) if days_with_goals > 0 else 0
+        user_id, goal_date, old_status = goal
+        apply_goal_change(cursor, user_id, goal_date, old_status, None)
+        cache.invalidate_goal(user_id, goal_date)
 
-    # Streaks
-    cursor.execute(
-        """SELECT goal_date, status FROM goals
-           WHERE user_id = ?
-           ORDER BY goal_date DESC""",
-        (user_id,)
-    )
-    goals = cursor.fetchall()
 
-    current_streak = 0
-    best_streak = 0
-    temp_streak = 0
+def get_user_stats(user_id: int):
+    row = get_user_stats_row(user_id)
 
-    for goal_date, status in goals:
-        if status == "done":
-            temp_streak += 1
-            best_streak = max(best_streak, temp_streak)
-        else:
-            temp_streak = 0
+    # Days in system
+    if row and row[0]:
+        first_seen = datetime.fromisoformat(row[0])
+        days_total = (datetime.now() - first_seen).days + 1
+    else:
+        days_total = 1
 
-    # Current streak
-    for goal_date, status in goals:
-        if status == "done":
-            current_streak += 1
-        else:
-            break
+    if row:
+        _, days_with_goals, goals_done, current_streak, best_streak = row
+    else:
+        days_with_goals = goals_done = current_streak = best_streak = 0
 
-    conn.close()
+    done_percent = round(goals_done / days_with_goals * 100) if days_with_goals > 0 else 0
 
     return {
         "days_total": days_total,
@@ -151,34 +179,31 @@ def get_pending_goals_for_date(goal_date: date):
     )
     goals = cursor.fetchall()
 
-    conn.close()
     return goals
 
 
 def close_day(goal_date: date):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "UPDATE goals SET status = 'failed' WHERE goal_date = ? AND status = 'pending'",
-        (goal_date.isoformat(),)
-    )
-
-    conn.commit()
-    conn.close()
+    # pending -> failed leaves every user_stats field unchanged: both
+    # statuses count towards total_goals and both break a streak
+    with transaction() as cursor:
+        cursor.execute(
+            "UPDATE goals SET status = 'failed' WHERE goal_date = ? AND status = 'pending'",
+            (goal_date.isoformat(),)
+        )
+        # The day is final now, store its rollup
+        rollup_day(cursor, goal_date)
+        cache.invalidate_goals_on(goal_date)
 
 
 def add_reflection(goal_id: int, reflection_text: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "UPDATE goals SET reflection_text = ? WHERE id = ?",
-        (reflection_text, goal_id)
-    )
-
-    conn.commit()
-    conn.close()
+    with transaction() as cursor:
+        cursor.execute(
+            "UPDATE goals SET reflection_text = ? WHERE id = ? RETURNING user_id, goal_date",
+            (reflection_text, goal_id)
+        )
+        goal = cursor.fetchone()
+        if goal:
+            cache.invalidate_goal(*goal)
 
 
 def get_goal_by_id(goal_id: int):
@@ -188,7 +213,6 @@ def get_goal_by_id(goal_id: int):
     cursor.execute("SELECT * FROM goals WHERE id = ?", (goal_id,))
     goal = cursor.fetchone()
 
-    conn.close()
     return goal
 
 
@@ -202,5 +226,4 @@ def get_days_with_completed_goals(user_id: int) -> int:
     )
     count = cursor.fetchone()[0]
 
-    conn.close()
     return count
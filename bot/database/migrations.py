@@ -0,0 +1,272 @@
+"""Versioned schema migrations.
+
+The applied version is stored in PRAGMA user_version. Every migration runs
+in its own transaction together with the version bump, so an interrupted
+start simply repeats the unfinished migration next time.
+"""
+import logging
+import time
+
+from .db import get_connection, transaction
+from .families import rebuild_family_counters
+
+logger = logging.getLogger(__name__)
+
+# Rows sampled per index by ANALYZE, keeps it fast on large tables
+ANALYSIS_LIMIT = 1000
+
+# Migration N is MIGRATIONS[N - 1]: (description, steps).
+# A step is an SQL statement or a callable taking a cursor.
+# Never edit or reorder applied migrations, only append new ones.
+MIGRATIONS = [
+    ("index goals by date and status", [
+        "CREATE INDEX IF NOT EXISTS idx_goals_date_status ON goals(goal_date, status)",
+    ]),
+    ("index goals by wish", [
+        "CREATE INDEX IF NOT EXISTS idx_goals_wish_status_date ON goals(wish_id, status, goal_date)",
+    ]),
+    ("index wishes by user and family", [
+        "CREATE INDEX IF NOT EXISTS idx_wishes_user_status_position ON wishes(user_id, status, position)",
+        "CREATE INDEX IF NOT EXISTS idx_wishes_family ON wishes(family_id)",
+    ]),
+    ("index wish families by user", [
+        "CREATE INDEX IF NOT EXISTS idx_wish_families_user ON wish_families(user_id)",
+    ]),
+    # Rows are created lazily on first read or write, see user_stats.py
+    ("per-user stats table", [
+        """CREATE TABLE IF NOT EXISTS user_stats (
+               user_id INTEGER PRIMARY KEY,
+               total_goals INTEGER NOT NULL DEFAULT 0,
+               done_count INTEGER NOT NULL DEFAULT 0,
+               current_streak INTEGER NOT NULL DEFAULT 0,
+               best_streak INTEGER NOT NULL DEFAULT 0,
+               last_goal_date DATE
+           )""",
+    ]),
+    ("broadcast outbox", [
+        """CREATE TABLE IF NOT EXISTS broadcast_batches (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               slot TEXT NOT NULL UNIQUE,
+               kind TEXT NOT NULL,
+               goal_date DATE NOT NULL,
+               planned_at TIMESTAMP NOT NULL,
+               completed_at TIMESTAMP
+           )""",
+        """CREATE TABLE IF NOT EXISTS broadcast_outbox (
+               batch_id INTEGER NOT NULL,
+               user_id INTEGER NOT NULL,
+               status TEXT NOT NULL DEFAULT 'pending',
+               updated_at TIMESTAMP,
+               PRIMARY KEY (batch_id, user_id)
+           ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_broadcast_batches_unfinished ON broadcast_batches(completed_at)",
+    ]),
+    ("user delivery state", [
+        "ALTER TABLE users ADD COLUMN is_blocked INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE users ADD COLUMN failed_deliveries INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE users ADD COLUMN last_delivered_at TIMESTAMP",
+        # Broadcasts read only reachable users, matches "is_blocked = 0"
+        "CREATE INDEX IF NOT EXISTS idx_users_reachable ON users(user_id) WHERE is_blocked = 0",
+    ]),
+    ("fsm storage", [
+        """CREATE TABLE IF NOT EXISTS fsm_states (
+               key TEXT PRIMARY KEY,
+               state TEXT,
+               data TEXT,
+               expires_at REAL NOT NULL
+           ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_fsm_states_expires ON fsm_states(expires_at)",
+    ]),
+    # Every goal insert, update and delete takes the next change_seq, see
+    # database/export.py. Existing rows keep a NULL change_seq, which the
+    # export reads as their id, so no row is rewritten here.
+    ("goal change tracking", [
+        "ALTER TABLE goals ADD COLUMN updated_at TIMESTAMP",
+        "ALTER TABLE goals ADD COLUMN change_seq INTEGER",
+        "CREATE INDEX IF NOT EXISTS idx_goals_change_seq ON goals(change_seq) WHERE change_seq IS NOT NULL",
+        "CREATE TABLE IF NOT EXISTS change_counter (value INTEGER NOT NULL)",
+        "INSERT INTO change_counter (value) SELECT COALESCE(MAX(id), 0) FROM goals",
+        """CREATE TABLE IF NOT EXISTS goal_deletions (
+               change_seq INTEGER PRIMARY KEY,
+               goal_id INTEGER NOT NULL,
+               deleted_at TIMESTAMP NOT NULL
+           )""",
+        """CREATE TRIGGER IF NOT EXISTS goals_track_insert AFTER INSERT ON goals
+           BEGIN
+               UPDATE change_counter SET value = value + 1;
+               UPDATE goals SET change_seq = (SELECT value FROM change_counter),
+                                updated_at = datetime('now', 'localtime')
+               WHERE id = NEW.id;
+           END""",
+        # The WHEN clause skips the trigger's own change_seq updates
+        """CREATE TRIGGER IF NOT EXISTS goals_track_update AFTER UPDATE ON goals
+           WHEN NEW.change_seq IS OLD.change_seq
+           BEGIN
+               UPDATE change_counter SET value = value + 1;
+               UPDATE goals SET change_seq = (SELECT value FROM change_counter),
+                                updated_at = datetime('now', 'localtime')
+               WHERE id = NEW.id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS goals_track_delete AFTER DELETE ON goals
+           BEGIN
+               UPDATE change_counter SET value = value + 1;
+               INSERT INTO goal_deletions (change_seq, goal_id, deleted_at)
+               VALUES ((SELECT value FROM change_counter), OLD.id, datetime('now', 'localtime'));
+           END""",
+    ]),
+    # Filled by close_day and the refresh job, backfill with manage.py
+    ("daily metrics rollup", [
+        """CREATE TABLE IF NOT EXISTS daily_metrics (
+               metric_date DATE PRIMARY KEY,
+               goals_set INTEGER NOT NULL DEFAULT 0,
+               goals_done INTEGER NOT NULL DEFAULT 0,
+               goals_failed INTEGER NOT NULL DEFAULT 0,
+               active_users INTEGER NOT NULL DEFAULT 0,
+               new_users INTEGER NOT NULL DEFAULT 0,
+               updated_at TIMESTAMP
+           ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_users_first_seen ON users(first_seen_at)",
+    ]),
+    # Counters shown on the paths screen, kept by triggers. done_goals
+    # counts done goals of the family's wishes (as get_goals_by_family).
+    ("family counters", [
+        "ALTER TABLE wish_families ADD COLUMN wish_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE wish_families ADD COLUMN done_goals INTEGER NOT NULL DEFAULT 0",
+        # The paths screen reads a user's families in creation order
+        "DROP INDEX IF EXISTS idx_wish_families_user",
+        "CREATE INDEX IF NOT EXISTS idx_wish_families_user_created ON wish_families(user_id, created_at)",
+        rebuild_family_counters,
+        """CREATE TRIGGER IF NOT EXISTS wishes_count_insert AFTER INSERT ON wishes
+           WHEN NEW.family_id IS NOT NULL
+           BEGIN
+               UPDATE wish_families SET wish_count = wish_count + 1 WHERE id = NEW.family_id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS wishes_count_delete AFTER DELETE ON wishes
+           WHEN OLD.family_id IS NOT NULL
+           BEGIN
+               UPDATE wish_families
+               SET wish_count = wish_count - 1,
+                   done_goals = done_goals - (SELECT COUNT(*) FROM goals WHERE wish_id = OLD.id AND status = 'done')
+               WHERE id = OLD.family_id;
+           END""",
+        # A wish moving between families takes its done goals along
+        """CREATE TRIGGER IF NOT EXISTS wishes_count_move AFTER UPDATE OF family_id ON wishes
+           WHEN NEW.family_id IS NOT OLD.family_id
+           BEGIN
+               UPDATE wish_families
+               SET wish_count = wish_count - 1,
+                   done_goals = done_goals - (SELECT COUNT(*) FROM goals WHERE wish_id = OLD.id AND status = 'done')
+               WHERE id = OLD.family_id;
+               UPDATE wish_families
+               SET wish_count = wish_count + 1,
+                   done_goals = done_goals + (SELECT COUNT(*) FROM goals WHERE wish_id = NEW.id AND status = 'done')
+               WHERE id = NEW.family_id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS goals_count_insert AFTER INSERT ON goals
+           WHEN NEW.status = 'done' AND NEW.wish_id IS NOT NULL
+           BEGIN
+               UPDATE wish_families SET done_goals = done_goals + 1
+               WHERE id = (SELECT family_id FROM wishes WHERE id = NEW.wish_id);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS goals_count_delete AFTER DELETE ON goals
+           WHEN OLD.status = 'done' AND OLD.wish_id IS NOT NULL
+           BEGIN
+               UPDATE wish_families SET done_goals = done_goals - 1
+               WHERE id = (SELECT family_id FROM wishes WHERE id = OLD.wish_id);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS goals_count_update AFTER UPDATE OF status, wish_id ON goals
+           WHEN (OLD.status = 'done') != (NEW.status = 'done') OR OLD.wish_id IS NOT NEW.wish_id
+           BEGIN
+               UPDATE wish_families SET done_goals = done_goals - 1
+               WHERE OLD.status = 'done' AND id = (SELECT family_id FROM wishes WHERE id = OLD.wish_id);
+               UPDATE wish_families SET done_goals = done_goals + 1
+               WHERE NEW.status = 'done' AND id = (SELECT family_id FROM wishes WHERE id = NEW.wish_id);
+           END""",
+    ]),
+    # FTS5 index of goal texts with the goals table as external content,
+    # see database/search.py. The view adds the per-user owner token.
+    # Existing goals are indexed by manage.py rebuild-search, not here: the
+    # rebuild would hold the write lock through startup on a large table.
+    ("goal search", [
+        """CREATE VIEW IF NOT EXISTS goals_fts_source AS
+           SELECT id, 'u' || user_id AS owner, goal_text, reflection_text FROM goals""",
+        """CREATE VIRTUAL TABLE IF NOT EXISTS goals_fts USING fts5(
+               owner, goal_text, reflection_text,
+               content = 'goals_fts_source', content_rowid = 'id',
+               tokenize = 'unicode61 remove_diacritics 2'
+           )""",
+        # built = 0 until the rebuild ran, an empty goals table needs none.
+        # The triggers do nothing before that: an FTS5 'delete' of a goal
+        # that was never indexed would corrupt the index, and the rebuild
+        # reads every goal anyway.
+        "CREATE TABLE IF NOT EXISTS search_index_state (built INTEGER NOT NULL)",
+        "INSERT INTO search_index_state (built) SELECT NOT EXISTS (SELECT 1 FROM goals)",
+        """CREATE TRIGGER IF NOT EXISTS goals_fts_insert AFTER INSERT ON goals
+           WHEN (SELECT built FROM search_index_state)
+           BEGIN
+               INSERT INTO goals_fts (rowid, owner, goal_text, reflection_text)
+               VALUES (NEW.id, 'u' || NEW.user_id, NEW.goal_text, NEW.reflection_text);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS goals_fts_delete AFTER DELETE ON goals
+           WHEN (SELECT built FROM search_index_state)
+           BEGIN
+               INSERT INTO goals_fts (goals_fts, rowid, owner, goal_text, reflection_text)
+               VALUES ('delete', OLD.id, 'u' || OLD.user_id, OLD.goal_text, OLD.reflection_text);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS goals_fts_update AFTER UPDATE OF user_id, goal_text, reflection_text ON goals
+           WHEN (SELECT built FROM search_index_state)
+           BEGIN
+               INSERT INTO goals_fts (goals_fts, rowid, owner, goal_text, reflection_text)
+               VALUES ('delete', OLD.id, 'u' || OLD.user_id, OLD.goal_text, OLD.reflection_text);
+               INSERT INTO goals_fts (rowid, owner, goal_text, reflection_text)
+               VALUES (NEW.id, 'u' || NEW.user_id, NEW.goal_text, NEW.reflection_text);
+           END""",
+    ]),
+    # complete = 1 once every user with goals has a user_stats row: on a
+    # fresh database, or after manage.py backfill-stats. Until then the
+    # admin totals are counted from goals, see daily_metrics.get_bot_stats.
+    ("user stats completeness", [
+        "CREATE TABLE IF NOT EXISTS user_stats_state (complete INTEGER NOT NULL)",
+        "INSERT INTO user_stats_state (complete) SELECT NOT EXISTS (SELECT 1 FROM goals)",
+    ]),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version() -> int:
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate():
+    """Apply pending migrations, returns the number applied"""
+    applied = 0
+
+    for version, (description, steps) in enumerate(MIGRATIONS, start=1):
+        if get_schema_version() >= version:
+            continue
+
+        started = time.monotonic()
+        with transaction() as cursor:
+            # Another process may have applied it while we waited for the lock
+            if cursor.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+
+            cursor.execute(f"PRAGMA user_version = {version}")
+
+        applied += 1
+        logger.info(f"Migration {version} ({description}) applied in {time.monotonic() - started:.1f}s")
+
+    if applied:
+        # Refresh planner statistics so the new indexes get used
+        conn = get_connection()
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE")
+
+    return applied
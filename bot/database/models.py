@@ -0,0 +1,46 @@
+from datetime import date
+from typing import NamedTuple, Optional
+
+
+class ReminderRecipient(NamedTuple):
+    user_id: int
+    goal_id: Optional[int]
+    goal_text: Optional[str]
+    goal_status: Optional[str]
+    done_count: int
+
+
+class GoalView(NamedTuple):
+    """A goal with the text of its wish, as shown on goal cards"""
+    id: int
+    user_id: int
+    goal_date: date
+    goal_text: str
+    status: str
+    reflection_text: Optional[str]
+    wish_id: Optional[int]
+    wish_text: Optional[str]
+
+
+class HistoryPage(NamedTuple):
+    """Done goals of a wish, newest first: (id, goal_date, goal_text, reflection_text)"""
+    entries: list
+    has_older: bool
+    has_newer: bool
+
+
+class FamilySummary(NamedTuple):
+    """A family (path) with the counts shown on the paths screen"""
+    id: int
+    name: str
+    wish_count: int
+    done_goals: int
+
+
+class SearchHit(NamedTuple):
+    """A goal found by search; texts carry highlight markers, see search.py"""
+    goal_id: int
+    goal_date: str
+    status: str
+    goal_text: str
+    reflection: str
@@ -0,0 +1,140 @@
+"""Persistent broadcast outbox.
+
+A scheduled slot is planned once as a batch with one outbox row per
+recipient. Senders claim rows before sending and record the result
+afterwards, so a restart resumes the batch without sending any row twice.
+"""
+from datetime import date, datetime, timedelta
+from .db import get_connection, transaction
+from .models import ReminderRecipient
+from .users import record_deliveries
+
+
+def _goal_filter(without_goal: bool) -> str:
+    # Recipients: users without a goal, or (reminders) with an unfinished one
+    return "goals.id IS NULL" if without_goal else "(goals.id IS NULL OR goals.status != 'done')"
+
+
+def plan_batch(slot: str, kind: str, goal_date: date, without_goal: bool = False):
+    """Create the batch and its outbox rows, returns None if the slot already exists"""
+    with transaction() as cursor:
+        cursor.execute(
+            "INSERT OR IGNORE INTO broadcast_batches (slot, kind, goal_date, planned_at) VALUES (?, ?, ?, ?)",
+            (slot, kind, goal_date.isoformat(), datetime.now())
+        )
+        if cursor.rowcount == 0:
+            return None
+        batch_id = cursor.lastrowid
+
+        cursor.execute(
+            f"""INSERT INTO broadcast_outbox (batch_id, user_id)
+                SELECT ?, users.user_id FROM users
+                LEFT JOIN goals ON goals.user_id = users.user_id AND goals.goal_date = ?
+                WHERE users.is_blocked = 0 AND {_goal_filter(without_goal)}""",
+            (batch_id, goal_date.isoformat())
+        )
+
+    return batch_id
+
+
+def get_batch(slot: str):
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT * FROM broadcast_batches WHERE slot = ?", (slot,))
+    batch = cursor.fetchone()
+
+    return batch
+
+
+def get_unfinished_batches():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT * FROM broadcast_batches WHERE completed_at IS NULL ORDER BY id")
+    batches = cursor.fetchall()
+
+    return batches
+
+
+def claim_recipients(batch_id: int, goal_date: date, without_goal: bool = False, after_user_id: int = 0, limit: int = 50):
+    """Claim the next pending rows of a batch.
+
+    Returns (recipients, last_user_id). Rows whose user no longer needs the
+    message (goal done or set meanwhile) are marked skipped instead of being
+    returned. last_user_id is None once the batch has no pending rows left.
+    """
+    with transaction() as cursor:
+        cursor.execute(
+            """SELECT outbox.user_id, goals.id, goals.goal_text, goals.status,
+                      COALESCE(user_stats.done_count,
+                               (SELECT COUNT(*) FROM goals AS done
+                                WHERE done.user_id = outbox.user_id AND done.status = 'done'))
+               FROM broadcast_outbox AS outbox
+               LEFT JOIN goals ON goals.user_id = outbox.user_id AND goals.goal_date = ?
+               LEFT JOIN user_stats ON user_stats.user_id = outbox.user_id
+               WHERE outbox.batch_id = ? AND outbox.status = 'pending' AND outbox.user_id > ?
+               ORDER BY outbox.user_id
+               LIMIT ?""",
+            (goal_date.isoformat(), batch_id, after_user_id, limit)
+        )
+        rows = [ReminderRecipient(*row) for row in cursor.fetchall()]
+        if not rows:
+            return [], None
+
+        if without_goal:
+            recipients = [row for row in rows if row.goal_id is None]
+        else:
+            recipients = [row for row in rows if row.goal_status != "done"]
+        claimed = {row.user_id for row in recipients}
+
+        now = datetime.now()
+        cursor.executemany(
+            "UPDATE broadcast_outbox SET status = ?, updated_at = ? WHERE batch_id = ? AND user_id = ?",
+            [("sending" if row.user_id in claimed else "skipped", now, batch_id, row.user_id) for row in rows]
+        )
+
+    return recipients, rows[-1].user_id
+
+
+def mark_outbox(batch_id: int, results: list):
+    """Record send results and the users' delivery state.
+
+    results: (user_id, status) pairs, see users.record_deliveries
+    """
+    now = datetime.now()
+    with transaction() as cursor:
+        cursor.executemany(
+            "UPDATE broadcast_outbox SET status = ?, updated_at = ? WHERE batch_id = ? AND user_id = ?",
+            [(status, now, batch_id, user_id) for user_id, status in results]
+        )
+        record_deliveries(results)
+
+
+def complete_batch(batch_id: int, expire_pending: bool = False):
+    """Close a batch; with expire_pending its unsent rows are given up"""
+    with transaction() as cursor:
+        if expire_pending:
+            cursor.execute(
+                "UPDATE broadcast_outbox SET status = 'expired' WHERE batch_id = ? AND status = 'pending'",
+                (batch_id,)
+            )
+        cursor.execute(
+            "UPDATE broadcast_batches SET completed_at = ? WHERE id = ?",
+            (datetime.now(), batch_id)
+        )
+
+
+def prune_batches(keep_days: int):
+    """Delete finished batches planned more than keep_days ago"""
+    cutoff = datetime.now() - timedelta(days=keep_days)
+    with transaction() as cursor:
+        cursor.execute(
+            "DELETE FROM broadcast_outbox WHERE batch_id IN "
+            "(SELECT id FROM broadcast_batches WHERE completed_at IS NOT NULL AND planned_at < ?)",
+            (cutoff,)
+        )
+        cursor.execute(
+            "DELETE FROM broadcast_batches WHERE completed_at IS NOT NULL AND planned_at < ?",
+            (cutoff,)
+        )
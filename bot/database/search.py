@@ -0,0 +1,115 @@
+"""Full-text search over a user's goals and reflections.
+
+goals_fts is an FTS5 index with external content: the text lives only in
+goals, read through the goals_fts_source view, and triggers on goals keep
+the index in step (see the goal search migration). Every row carries an
+owner token "u<user_id>", so a search is a match on the user's token AND
+the query, an intersection of two posting lists rather than a filter over
+everyone's hits.
+
+A database migrated with goals already in it has an empty index until
+manage.py rebuild-search ran; until then search falls back to scanning
+the user's own goals.
+"""
+import re
+import time
+
+from config import SEARCH_PAGE_SIZE, SEARCH_MIN_PREFIX
+from .db import get_connection, transaction
+from .models import SearchHit
+
+# highlight() / snippet() markers; control characters never occur in
+# Telegram text, so callers can escape the rest and then format these
+MARK_START = "\x02"
+MARK_END = "\x03"
+
+# Column weights for bm25: owner, goal_text, reflection_text
+_BM25_WEIGHTS = "0.0, 2.0, 1.0"
+
+_WORD = re.compile(r"\w+")
+
+# Set once search_index_state says the index is built, it stays built
+_index_built = False
+
+
+def build_match_query(text: str, user_id: int):
+    """FTS5 query for the words of text within the user's goals, None without words.
+
+    Each word is quoted (so FTS5 syntax in user input means nothing).
+    Words of SEARCH_MIN_PREFIX letters or more are matched as prefixes,
+    which also finds other forms of Russian words; shorter prefixes would
+    expand to too many terms.
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return None
+    terms = " ".join(f'"{word}"*' if len(word) >= SEARCH_MIN_PREFIX else f'"{word}"' for word in words)
+    return f"owner:u{user_id} AND {{goal_text reflection_text}}: ({terms})"
+
+
+def is_index_built() -> bool:
+    global _index_built
+    if not _index_built:
+        row = get_connection().execute("SELECT built FROM search_index_state").fetchone()
+        _index_built = bool(row and row[0])
+    return _index_built
+
+
+def _scan_goals(user_id: int, words: list, page: int, page_size: int):
+    """search_goals without the index: the user's goals containing every
+    word, newest first and without highlighting"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """SELECT id, goal_date, status, goal_text, reflection_text
+           FROM goals WHERE user_id = ? ORDER BY goal_date DESC""",
+        (user_id,)
+    )
+    hits = []
+    for row in cursor:
+        content = f"{row[3]} {row[4] or ''}".lower()
+        if all(word in content for word in words):
+            hits.append(SearchHit(*row))
+
+    start = page * page_size
+    return hits[start:start + page_size], len(hits) > start + page_size
+
+
+def search_goals(user_id: int, text: str, page: int = 0, page_size: int = SEARCH_PAGE_SIZE):
+    """A page of the user's goals matching text, best first; (hits, has_more)"""
+    query = build_match_query(text, user_id)
+    if query is None:
+        return [], False
+    if not is_index_built():
+        return _scan_goals(user_id, _WORD.findall(text.lower()), page, page_size)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        f"""SELECT goals.id, goals.goal_date, goals.status,
+                   highlight(goals_fts, 1, ?, ?),
+                   snippet(goals_fts, 2, ?, ?, '…', 16)
+            FROM goals_fts JOIN goals ON goals.id = goals_fts.rowid
+            WHERE goals_fts MATCH ?
+            ORDER BY bm25(goals_fts, {_BM25_WEIGHTS})
+            LIMIT ? OFFSET ?""",
+        (MARK_START, MARK_END, MARK_START, MARK_END, query, page_size + 1, page * page_size)
+    )
+    rows = cursor.fetchall()
+
+    hits = [SearchHit(*row) for row in rows[:page_size]]
+    return hits, len(rows) > page_size
+
+
+def rebuild_search_index(optimize: bool = True) -> float:
+    """Rebuild goals_fts from goals, returns the seconds taken"""
+    started = time.monotonic()
+    with transaction() as cursor:
+        cursor.execute("INSERT INTO goals_fts (goals_fts) VALUES ('rebuild')")
+        cursor.execute("UPDATE search_index_state SET built = 1")
+        if optimize:
+            # Merge all segments, so queries read one b-tree per term
+            cursor.execute("INSERT INTO goals_fts (goals_fts) VALUES ('optimize')")
+    return time.monotonic() - started
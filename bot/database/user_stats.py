@@ -0,0 +1,182 @@
+"""Per-user goal statistics kept up to date by the goal write functions.
+
+Streak semantics match the original full scan: goals are ordered by date,
+the current streak is the run of done goals ending at the latest goal and
+the best streak is the longest such run. All helpers take the cursor of an
+open transaction so stats change atomically with the goal row.
+"""
+from .db import get_connection, transaction
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def _done_run(cursor, user_id: int, goal_date: str) -> int:
+    """Length of the run of done goals around goal_date (index range scans)"""
+    cursor.execute(
+        """SELECT goal_date FROM goals
+           WHERE user_id = ? AND goal_date < ? AND status != 'done'
+           ORDER BY goal_date DESC LIMIT 1""",
+        (user_id, goal_date)
+    )
+    row = cursor.fetchone()
+    lower = row[0] if row else ""
+
+    cursor.execute(
+        """SELECT goal_date FROM goals
+           WHERE user_id = ? AND goal_date > ? AND status != 'done'
+           ORDER BY goal_date LIMIT 1""",
+        (user_id, goal_date)
+    )
+    row = cursor.fetchone()
+    upper = row[0] if row else "9999-12-31"
+
+    cursor.execute(
+        "SELECT COUNT(*) FROM goals WHERE user_id = ? AND goal_date > ? AND goal_date < ?",
+        (user_id, lower, upper)
+    )
+    return cursor.fetchone()[0]
+
+
+def _current_streak(cursor, user_id: int):
+    """(last goal date, current streak)"""
+    cursor.execute(
+        "SELECT goal_date, status FROM goals WHERE user_id = ? ORDER BY goal_date DESC LIMIT 1",
+        (user_id,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None, 0
+
+    last_goal_date, status = row
+    if status != "done":
+        return last_goal_date, 0
+    return last_goal_date, _done_run(cursor, user_id, last_goal_date)
+
+
+def _best_streak(cursor, user_id: int) -> int:
+    cursor.execute(
+        """SELECT COALESCE(MAX(run), 0) FROM (
+               SELECT COUNT(*) AS run FROM (
+                   SELECT status, SUM(status != 'done') OVER (ORDER BY goal_date) AS grp
+                   FROM goals WHERE user_id = ?
+               )
+               WHERE status = 'done'
+               GROUP BY grp
+           )""",
+        (user_id,)
+    )
+    return cursor.fetchone()[0]
+
+
+def rebuild_user_stats(cursor, user_id: int):
+    """Recompute a user's row from the goals table"""
+    cursor.execute(
+        "SELECT COUNT(*), COALESCE(SUM(status = 'done'), 0) FROM goals WHERE user_id = ?",
+        (user_id,)
+    )
+    total_goals, done_count = cursor.fetchone()
+    last_goal_date, current_streak = _current_streak(cursor, user_id)
+    best_streak = _best_streak(cursor, user_id)
+
+    cursor.execute(
+        """INSERT OR REPLACE INTO user_stats
+           (user_id, total_goals, done_count, current_streak, best_streak, last_goal_date)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (user_id, total_goals, done_count, current_streak, best_streak, last_goal_date)
+    )
+
+
+def apply_goal_change(cursor, user_id: int, goal_date: str, old_status: str = None, new_status: str = None):
+    """Update stats after one goal row changed.
+
+    old_status is None for an inserted goal, new_status is None for a
+    deleted one. Must be called after the goal row was written.
+    """
+    cursor.execute(
+        "SELECT total_goals, done_count, best_streak FROM user_stats WHERE user_id = ?",
+        (user_id,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        rebuild_user_stats(cursor, user_id)
+        return
+
+    total_goals, done_count, best_streak = row
+    was_done = old_status == "done"
+    is_done = new_status == "done"
+
+    total_goals += (new_status is not None) - (old_status is not None)
+    done_count += is_done - was_done
+
+    last_goal_date, current_streak = _current_streak(cursor, user_id)
+
+    if was_done and not is_done:
+        # A run was cut or shortened, the best one may be gone
+        best_streak = _best_streak(cursor, user_id)
+    elif old_status is None and not is_done and goal_date < last_goal_date:
+        # A non-done goal inserted before the latest one may split a run
+        best_streak = _best_streak(cursor, user_id)
+    elif (is_done and not was_done) or (old_status is not None and new_status is None):
+        # Runs only grew: goal became done or a non-done goal was removed
+        best_streak = max(best_streak, _done_run(cursor, user_id, goal_date))
+
+    best_streak = max(best_streak, current_streak)
+
+    cursor.execute(
+        """UPDATE user_stats
+           SET total_goals = ?, done_count = ?, current_streak = ?, best_streak = ?, last_goal_date = ?
+           WHERE user_id = ?""",
+        (total_goals, done_count, current_streak, best_streak, last_goal_date, user_id)
+    )
+
+
+def get_user_stats_row(user_id: int):
+    """(first_seen_at, total_goals, done_count, current_streak, best_streak) by primary key"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    query = """SELECT users.first_seen_at, user_stats.total_goals, user_stats.done_count,
+                      user_stats.current_streak, user_stats.best_streak
+               FROM users LEFT JOIN user_stats ON user_stats.user_id = users.user_id
+               WHERE users.user_id = ?"""
+
+    cursor.execute(query, (user_id,))
+    row = cursor.fetchone()
+
+    if row and row[1] is None:
+        # No stats yet (user predates the table and backfill has not run)
+        with transaction() as write_cursor:
+            rebuild_user_stats(write_cursor, user_id)
+        cursor.execute(query, (user_id,))
+        row = cursor.fetchone()
+
+    return row
+
+
+def backfill_user_stats() -> int:
+    """Rebuild user_stats for every user, returns the number of users"""
+    conn = get_connection()
+    last_user_id = 0
+    count = 0
+
+    while True:
+        cursor = conn.execute(
+            "SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?",
+            (last_user_id, BACKFILL_BATCH_SIZE)
+        )
+        user_ids = [row[0] for row in cursor.fetchall()]
+        if not user_ids:
+            break
+
+        with transaction() as cursor:
+            for user_id in user_ids:
+                rebuild_user_stats(cursor, user_id)
+
+        count += len(user_ids)
+        last_user_id = user_ids[-1]
+
+    # Users writing goals meanwhile got their rows from apply_goal_change
+    with transaction() as cursor:
+        cursor.execute("UPDATE user_stats_state SET complete = 1")
+
+    return count
@@ -1,21 +1,26 @@
-from .db import get_connection
+from datetime import datetime
+from config import DELIVERY_MAX_FAILURES
+from .db import get_connection, transaction
 
 
 def get_or_create_user(user_id: int, username: str = None, first_name: str = None):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-    user = cursor.fetchone()
-
-    if not user:
-        cursor.execute(
-            "INSERT INTO users (user_id, username, first_name) VALUES (?, ?, ?)",
-            (user_id, username, first_name)
-        )
-        conn.commit()
+    with transaction() as cursor:
+        cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
+        user = cursor.fetchone()
+
+        if not user:
+            cursor.execute(
+                "INSERT INTO users (user_id, username, first_name) VALUES (?, ?, ?)",
+                (user_id, username, first_name)
+            )
+        else:
+            # The user is back (/start after blocking the bot), deliver again
+            cursor.execute(
+                """UPDATE users SET is_blocked = 0, failed_deliveries = 0
+                   WHERE user_id = ? AND (is_blocked != 0 OR failed_deliveries != 0)""",
+                (user_id,)
+            )
 
-    conn.close()
     return user
 
 
@@ -26,5 +31,32 @@ def get_user(user_id: int):
     cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
     user = cursor.fetchone()
 
-    conn.close()
     return user
+
+
+def record_deliveries(results: list):
+    """Update delivery state from (user_id, status) pairs.
+
+    status: 'sent' resets the failure count, 'blocked' marks the user
+    unreachable, 'rejected' counts towards DELIVERY_MAX_FAILURES and
+    'failed' (transient errors) leaves the state unchanged.
+    """
+    delivered = [(datetime.now(), user_id) for user_id, status in results if status == "sent"]
+    blocked = [(user_id,) for user_id, status in results if status == "blocked"]
+    rejected = [(DELIVERY_MAX_FAILURES, user_id) for user_id, status in results if status == "rejected"]
+
+    with transaction() as cursor:
+        cursor.executemany(
+            "UPDATE users SET last_delivered_at = ?, failed_deliveries = 0 WHERE user_id = ?",
+            delivered
+        )
+        cursor.executemany(
+            "UPDATE users SET is_blocked = 1, failed_deliveries = failed_deliveries + 1 WHERE user_id = ?",
+            blocked
+        )
+        cursor.executemany(
+            """UPDATE users SET failed_deliveries = failed_deliveries + 1,
+                                is_blocked = failed_deliveries + 1 >= ?
+               WHERE user_id = ?""",
+            rejected
+        )
@@ -1,33 +1,58 @@
 from datetime import datetime
-from .db import get_connection
+from config import HISTORY_PAGE_SIZE, MAX_ACTIVE_WISHES
+from .db import get_connection, transaction
+from .models import HistoryPage
+from . import cache
 
+DEFAULT_WISH_TEXT = 'Без категории'
 
-def create_wish(user_id: int, text: str):
-    conn = get_connection()
-    cursor = conn.cursor()
+# Active wishes of the user in {owner} that count towards MAX_ACTIVE_WISHES
+_ACTIVE_COUNT = f"""SELECT COUNT(*) FROM wishes AS active
+                    WHERE active.user_id = {{owner}} AND active.status = 'active'
+                      AND active.text != '{DEFAULT_WISH_TEXT}'"""
 
-    cursor.execute(
-        "INSERT INTO wishes (user_id, text) VALUES (?, ?)",
-        (user_id, text)
-    )
 
-    conn.commit()
-    wish_id = cursor.lastrowid
-    conn.close()
-    return wish_id
+def create_wish(user_id: int, text: str):
+    """Id of the new wish, None if the user is at MAX_ACTIVE_WISHES.
+
+    The limit is checked by the INSERT itself, so concurrent creates
+    cannot both pass it. The default wish is exempt.
+    """
+    with transaction() as cursor:
+        cursor.execute(
+            f"""INSERT INTO wishes (user_id, text)
+                SELECT ?, ? WHERE ? = ? OR ({_ACTIVE_COUNT.format(owner='?')}) < ?
+                RETURNING id""",
+            (user_id, text, text, DEFAULT_WISH_TEXT, user_id, MAX_ACTIVE_WISHES)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cache.invalidate_wishes(user_id)
+
+    return row[0]
 
 
 def get_active_wishes(user_id: int):
+    """Read through the per-user cache, see cache.py"""
     conn = get_connection()
     cursor = conn.cursor()
 
+    use_cache = not conn.in_transaction
+    if use_cache:
+        wishes = cache.get_wishes(user_id)
+        if wishes is not cache.MISSING:
+            return list(wishes)
+        read_generation = cache.generation()
+
     cursor.execute(
         "SELECT * FROM wishes WHERE user_id = ? AND status = 'active' ORDER BY position, created_at",
         (user_id,)
     )
     wishes = cursor.fetchall()
 
-    conn.close()
+    if use_cache:
+        cache.store_wishes(user_id, tuple(wishes), read_generation)
     return wishes
 
 
@@ -41,7 +66,6 @@ def get_all_wishes(user_id: int):
     )
     wishes = cursor.fetchall()
 
-    conn.close()
     return wishes
 
 
@@ -52,87 +76,120 @@ def get_wish(wish_id: int):
     cursor.execute("SELECT * FROM wishes WHERE id = ?", (wish_id,))
     wish = cursor.fetchone()
 
-    conn.close()
     return wish
 
 
 def update_wish_status(wish_id: int, status: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-
+    """The updated wish row, None if it does not exist or activating it
+    would exceed MAX_ACTIVE_WISHES (checked in the same UPDATE)"""
     archived_at = datetime.now() if status == "archived" else None
 
-    cursor.execute(
-        "UPDATE wishes SET status = ?, archived_at = ? WHERE id = ?",
-        (status, archived_at, wish_id)
-    )
+    with transaction() as cursor:
+        cursor.execute(
+            f"""UPDATE wishes SET status = ?, archived_at = ?
+                WHERE id = ? AND (? != 'active' OR status = 'active' OR text = ?
+                                  OR ({_ACTIVE_COUNT.format(owner='wishes.user_id')}) < ?)
+                RETURNING *""",
+            (status, archived_at, wish_id, status, DEFAULT_WISH_TEXT, MAX_ACTIVE_WISHES)
+        )
+        wish = cursor.fetchone()
+        if wish:
+            cache.invalidate_wishes(wish[1])
 
-    conn.commit()
-    conn.close()
+    return wish
 
 
 def update_wish_text(wish_id: int, text: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "UPDATE wishes SET text = ? WHERE id = ?",
-        (text, wish_id)
-    )
+    """The updated wish row, None if it does not exist"""
+    with transaction() as cursor:
+        cursor.execute("UPDATE wishes SET text = ? WHERE id = ? RETURNING *", (text, wish_id))
+        wish = cursor.fetchone()
+        if wish:
+            cache.invalidate_wishes(wish[1], goals=True)
 
-    conn.commit()
-    conn.close()
+    return wish
 
 
 def delete_wish(wish_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("DELETE FROM wishes WHERE id = ?", (wish_id,))
-
-    conn.commit()
-    conn.close()
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM wishes WHERE id = ? RETURNING user_id", (wish_id,))
+        wish = cursor.fetchone()
+        if wish:
+            cache.invalidate_wishes(wish[0], goals=True)
 
 
 def count_active_wishes(user_id: int) -> int:
     """Count active wishes excluding 'Без категории'"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    return sum(1 for wish in get_active_wishes(user_id) if wish[2] != DEFAULT_WISH_TEXT)
 
-    cursor.execute(
-        "SELECT COUNT(*) FROM wishes WHERE user_id = ? AND status = 'active' AND text != 'Без категории'",
-        (user_id,)
-    )
-    count = cursor.fetchone()[0]
 
-    conn.close()
-    return count
+def set_wish_family(wish_id: int, family_id: int = None):
+    with transaction() as cursor:
+        cursor.execute(
+            "UPDATE wishes SET family_id = ? WHERE id = ? RETURNING user_id",
+            (family_id, wish_id)
+        )
+        wish = cursor.fetchone()
+        if wish:
+            cache.invalidate_wishes(wish[0])
 
 
-def set_wish_family(wish_id: int, family_id: int = None):
+def get_goals_by_wish(wish_id: int):
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute(
-        "UPDATE wishes SET family_id = ? WHERE id = ?",
-        (family_id, wish_id)
+        """SELECT * FROM goals
+           WHERE wish_id = ? AND status = 'done'
+           ORDER BY goal_date DESC""",
+        (wish_id,)
     )
+    goals = cursor.fetchall()
 
-    conn.commit()
-    conn.close()
+    return goals
 
 
-def get_goals_by_wish(wish_id: int):
+def count_done_goals_by_wish(wish_id: int) -> int:
+    """Done goals of a wish, counted on the (wish_id, status, goal_date) index"""
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute(
-        """SELECT * FROM goals
-           WHERE wish_id = ? AND status = 'done'
-           ORDER BY goal_date DESC""",
+        "SELECT COUNT(*) FROM goals WHERE wish_id = ? AND status = 'done'",
         (wish_id,)
     )
-    goals = cursor.fetchall()
+    count = cursor.fetchone()[0]
 
-    conn.close()
-    return goals
+    return count
+
+
+def get_wish_history_page(wish_id: int, after: tuple = None, older: bool = True, limit: int = HISTORY_PAGE_SIZE):
+    """A page of a wish's history, newest first.
+
+    Keyset pagination over (goal_date, id): after is the (goal_date, id)
+    of the last entry shown (older=True) or the first one (older=False),
+    None for the newest page. Each page is one index range scan, however
+    long the history is.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    query = "SELECT id, goal_date, goal_text, reflection_text FROM goals WHERE wish_id = ? AND status = 'done'"
+    params = [wish_id]
+    if after is not None:
+        query += " AND (goal_date, id) < (?, ?)" if older else " AND (goal_date, id) > (?, ?)"
+        params.extend(after)
+    order = "DESC" if older else "ASC"
+    query += f" ORDER BY goal_date {order}, id {order} LIMIT ?"
+    # One extra row tells whether there is a further page
+    params.append(limit + 1)
+
+    cursor.execute(query, params)
+    entries = cursor.fetchall()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    if older:
+        return HistoryPage(entries, has_older=has_more, has_newer=after is not None)
+    entries.reverse()
+    return HistoryPage(entries, has_older=True, has_newer=has_more)
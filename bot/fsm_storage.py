@@ -0,0 +1,116 @@
+"""FSM storage in the bot's SQLite database.
+
+Dialog states survive restarts and are shared by every worker using the
+same database. Writes always go to the database; a single worker can
+also cache records for FSM_CACHE_TTL seconds, so a dialog step costs one
+write and no read.
+"""
+import json
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from config import FSM_STATE_TTL_HOURS, FSM_CACHE_SIZE, FSM_CACHE_TTL
+from database.aio import get_fsm_record, set_fsm_state, set_fsm_data
+
+# Dates (goal_date) are stored as {"$d": "YYYY-MM-DD"}
+_DATE_TAG = "$d"
+
+
+def _encode_value(value):
+    if isinstance(value, date):
+        return {_DATE_TAG: value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__} in FSM data")
+
+
+def _decode_object(obj: dict):
+    if len(obj) == 1 and _DATE_TAG in obj:
+        return date.fromisoformat(obj[_DATE_TAG])
+    return obj
+
+
+def encode_data(data: Mapping[str, Any]) -> Optional[str]:
+    if not data:
+        return None
+    return json.dumps(data, default=_encode_value, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_data(data: Optional[str]) -> dict:
+    if not data:
+        return {}
+    return json.loads(data, object_hook=_decode_object)
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(
+        self,
+        key_builder: KeyBuilder = None,
+        state_ttl: float = FSM_STATE_TTL_HOURS * 3600,
+        cache_size: int = FSM_CACHE_SIZE,
+        cache_ttl: float = FSM_CACHE_TTL
+    ):
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.state_ttl = state_ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # key -> (state, data, cached at)
+        self._cache = OrderedDict()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        state = state.state if isinstance(state, State) else state
+
+        await set_fsm_state(storage_key, state, time.time() + self.state_ttl)
+        self._update_cached(storage_key, state=state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self.key_builder.build(key)
+        data = dict(data)
+
+        await set_fsm_data(storage_key, encode_data(data), time.time() + self.state_ttl)
+        self._update_cached(storage_key, data=data)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data = await self._load(self.key_builder.build(key))
+        # Callers (update_data) modify the result, keep the cached copy intact
+        return dict(data)
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+    async def _load(self, storage_key: str):
+        """(state, data) from the cache, or from the database on a miss"""
+        cached = self._cache.get(storage_key)
+        if cached is not None and time.monotonic() - cached[2] < self.cache_ttl:
+            self._cache.move_to_end(storage_key)
+            return cached[0], cached[1]
+
+        record = await get_fsm_record(storage_key)
+        state, data = (record[0], decode_data(record[1])) if record else (None, {})
+        self._remember(storage_key, state, data)
+        return state, data
+
+    def _update_cached(self, storage_key: str, **changes):
+        """Apply a write to a cached record. It keeps the time it was read,
+        so a record another worker changed is still reloaded in time."""
+        cached = self._cache.get(storage_key)
+        if cached is None:
+            return
+        state, data, cached_at = cached
+        self._cache[storage_key] = (changes.get("state", state), changes.get("data", data), cached_at)
+
+    def _remember(self, storage_key: str, state: Optional[str], data: dict):
+        if self.cache_ttl <= 0:
+            return
+        self._cache[storage_key] = (state, data, time.monotonic())
+        self._cache.move_to_end(storage_key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
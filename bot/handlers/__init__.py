@@ -5,6 +5,7 @@ router = Router()
 from . import start
 from . import goals
 from . import stats
+from . import search
 from . import admin
 from . import wishes
 from . import families
@@ -1,29 +1,23 @@
-import csv
+import asyncio
 import logging
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
 from datetime import date, timedelta
 from pathlib import Path
 from aiogram import F
-from aiogram.types import Message, FSInputFile
-from aiogram.filters import Command
+from aiogram.types import Message, FSInputFile, BufferedInputFile
+from aiogram.filters import Command, CommandObject
 
 from . import router
-from config import ADMINS_FILE, BASE_DIR
-from database.db import get_connection
-from texts import MSG_NOT_ADMIN
+from admins import is_admin
+from charts import activity_chart
+from database.export import export_tables, export_goal_changes
+from database.aio import get_bot_stats, get_daily_activity
+from texts import MSG_NOT_ADMIN, MSG_EXPORT_WATERMARK, MSG_EXPORT_BAD_WATERMARK
 
 logger = logging.getLogger(__name__)
 
 
-def is_admin(user_id: int) -> bool:
-    if not ADMINS_FILE.exists():
-        return False
-
-    with open(ADMINS_FILE, "r") as f:
-        admin_ids = [line.strip() for line in f if line.strip() and not line.startswith("#")]
-
-    return str(user_id) in admin_ids
-
-
 async def check_admin(message: Message) -> bool:
     if is_admin(message.from_user.id):
         return True
@@ -38,28 +32,14 @@ async def admin_stats(message: Message):
 
     logger.info(f"admin command /admin_stats by {message.from_user.id}")
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM goals")
-    total_goals = cursor.fetchone()[0]
-
-    cursor.execute(
-        "SELECT COUNT(*) FROM goals WHERE goal_date = ?",
-        (date.today().isoformat(),)
-    )
-    goals_today = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM goals WHERE status = 'done'")
-    done_goals = cursor.fetchone()[0]
+    stats = await get_bot_stats()
+    total_users = stats["total_users"]
+    total_goals = stats["total_goals"]
+    goals_today = stats["goals_today"]
+    done_goals = stats["done_goals"]
 
     done_percent = round(done_goals / total_goals * 100) if total_goals > 0 else 0
 
-    conn.close()
-
     await message.answer(
         f"📊 Статистика бота:\n\n"
         f"👥 Пользователей: {total_users}\n"
@@ -70,39 +50,35 @@ async def admin_stats(message: Message):
 
 
 @router.message(Command("admin_export"))
-async def admin_export(message: Message):
+async def admin_export(message: Message, command: CommandObject):
     if not await check_admin(message):
         return
 
     logger.info(f"admin command /admin_export by {message.from_user.id}")
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Export users
-    cursor.execute("SELECT * FROM users")
-    users = cursor.fetchall()
-
-    users_file = BASE_DIR / "users.csv"
-    with open(users_file, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["user_id", "username", "first_name", "first_seen_at"])
-        writer.writerows(users)
+    # "/admin_export N" exports only the goals changed after watermark N
+    since = None
+    if command.args:
+        try:
+            since = int(command.args.strip())
+        except ValueError:
+            await message.answer(MSG_EXPORT_BAD_WATERMARK)
+            return
 
-    # Export goals
-    cursor.execute("SELECT * FROM goals")
-    goals = cursor.fetchall()
+    # A directory per export, so concurrent exports never share files
+    with tempfile.TemporaryDirectory(prefix="export-") as directory:
+        if since is None:
+            files = await asyncio.to_thread(export_tables, Path(directory))
+            watermark = None
+        else:
+            files, watermark = await asyncio.to_thread(export_goal_changes, Path(directory), since)
 
-    goals_file = BASE_DIR / "goals.csv"
-    with open(goals_file, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["id", "user_id", "goal_date", "goal_text", "status", "created_at", "completed_at", "locked_after_done"])
-        writer.writerows(goals)
+        stamp = date.today().isoformat()
+        for path in files:
+            await message.answer_document(FSInputFile(path, filename=f"{stamp}_{path.name}"))
 
-    conn.close()
-
-    await message.answer_document(FSInputFile(users_file))
-    await message.answer_document(FSInputFile(goals_file))
+    if watermark is not None:
+        await message.answer(MSG_EXPORT_WATERMARK.format(watermark=watermark))
 
 
 @router.message(Command("admin_metric"))
@@ -112,54 +88,28 @@ async def admin_metric(message: Message):
 
     logger.info(f"admin command /admin_metric by {message.from_user.id}")
 
-    try:
-        import matplotlib
-        matplotlib.use('Agg')
-        import matplotlib.pyplot as plt
-    except ImportError:
-        await message.answer("❌ matplotlib не установлен")
-        return
-
-    conn = get_connection()
-    cursor = conn.cursor()
-
     # Get data for last 30 days
     end_date = date.today()
     start_date = end_date - timedelta(days=30)
 
-    cursor.execute(
-        """SELECT goal_date, COUNT(DISTINCT user_id), COUNT(*)
-           FROM goals
-           WHERE goal_date >= ? AND goal_date <= ?
-           GROUP BY goal_date
-           ORDER BY goal_date""",
-        (start_date.isoformat(), end_date.isoformat())
-    )
-    data = cursor.fetchall()
-    conn.close()
+    data = await get_daily_activity(start_date, end_date)
 
     if not data:
         await message.answer("📊 Нет данных для графика")
         return
 
-    dates = [row[0] for row in data]
-    users_count = [row[1] for row in data]
-    goals_count = [row[2] for row in data]
-
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
-
-    ax1.bar(dates, users_count, color='steelblue')
-    ax1.set_title('Пользователей с целями по дням')
-    ax1.tick_params(axis='x', rotation=45)
-
-    ax2.bar(dates, goals_count, color='coral')
-    ax2.set_title('Целей по дням')
-    ax2.tick_params(axis='x', rotation=45)
-
-    plt.tight_layout()
+    try:
+        chart = await activity_chart(start_date, end_date, data)
+    except ImportError:
+        await message.answer("❌ matplotlib не установлен")
+        return
+    except BrokenProcessPool:
+        await message.answer("❌ Не удалось построить график, попробуй ещё раз")
+        return
 
-    chart_path = BASE_DIR / "metric.png"
-    plt.savefig(chart_path, dpi=100)
-    plt.close()
+    if chart.file_id:
+        await message.answer_photo(chart.file_id)
+        return
 
-    await message.answer_photo(FSInputFile(chart_path))
+    sent = await message.answer_photo(BufferedInputFile(chart.png, filename="metric.png"))
+    chart.file_id = sent.photo[-1].file_id
@@ -5,15 +5,15 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from . import router
-from database import (
-    create_family, get_families, get_family,
+from database.aio import (
+    create_family, get_family_summaries, get_family,
     update_family_name, delete_family, get_wishes_in_family,
     set_wish_family, get_active_wishes
 )
 from keyboards.families import families_menu_kb, family_actions_kb, select_family_kb
 from texts import (
     MSG_PATHS_INTRO, MSG_PATHS_EMPTY, MSG_ENTER_PATH_NAME,
-    MSG_PATH_CREATED, MSG_PATH_DELETED, MSG_SELECT_PATH, BTN_PATHS
+    MSG_PATH_CREATED, MSG_PATH_DELETED, MSG_SELECT_PATH, MSG_PATH_LINE, BTN_PATHS
 )
 
 logger = logging.getLogger(__name__)
@@ -24,20 +24,25 @@ class FamilyStates(StatesGroup):
     waiting_for_edit = State()
 
 
-@router.callback_query(F.data == "paths_menu")
-async def paths_menu(callback: CallbackQuery):
-    families = get_families(callback.from_user.id)
+async def paths_menu_view(user_id: int):
+    """Text and keyboard of the paths screen"""
+    families = await get_family_summaries(user_id)
 
     text = MSG_PATHS_INTRO + "\n\n"
 
     if families:
         for family in families:
-            wishes = get_wishes_in_family(family[0])
-            text += f"🛤 <b>{family[2]}</b> ({len(wishes)} хочу)\n"
+            text += MSG_PATH_LINE.format(name=family.name, wishes=family.wish_count, done=family.done_goals)
     else:
         text += MSG_PATHS_EMPTY
 
-    await callback.message.edit_text(text, reply_markup=families_menu_kb(families))
+    return text, families_menu_kb(families)
+
+
+@router.callback_query(F.data == "paths_menu")
+async def paths_menu(callback: CallbackQuery):
+    text, keyboard = await paths_menu_view(callback.from_user.id)
+    await callback.message.edit_text(text, reply_markup=keyboard)
     await callback.answer()
 
 
@@ -50,31 +55,26 @@ async def create_path_start(callback: CallbackQuery, state: FSMContext):
 
 @router.message(FamilyStates.waiting_for_name)
 async def save_path(message: Message, state: FSMContext):
-    create_family(message.from_user.id, message.text)
+    await create_family(message.from_user.id, message.text)
     logger.info(f"User {message.from_user.id} created a path")
 
     await state.clear()
 
     # Show paths menu
-    families = get_families(message.from_user.id)
-    text = MSG_PATHS_INTRO + "\n\n"
-    for family in families:
-        wishes = get_wishes_in_family(family[0])
-        text += f"🛤 <b>{family[2]}</b> ({len(wishes)} хочу)\n"
-
-    await message.answer(text, reply_markup=families_menu_kb(families))
+    text, keyboard = await paths_menu_view(message.from_user.id)
+    await message.answer(text, reply_markup=keyboard)
 
 
 @router.callback_query(F.data.startswith("path:"))
 async def show_path(callback: CallbackQuery):
     family_id = int(callback.data.split(":")[1])
-    family = get_family(family_id)
+    family = await get_family(family_id)
 
     if not family:
         await callback.answer("Путь не найден", show_alert=True)
         return
 
-    wishes = get_wishes_in_family(family_id)
+    wishes = await get_wishes_in_family(family_id)
 
     text = f"🛤 <b>{family[2]}</b>\n\n"
     if wishes:
@@ -91,22 +91,14 @@ async def show_path(callback: CallbackQuery):
 @router.callback_query(F.data.startswith("path_delete:"))
 async def delete_path_handler(callback: CallbackQuery):
     family_id = int(callback.data.split(":")[1])
-    delete_family(family_id)
+    await delete_family(family_id)
     logger.info(f"User {callback.from_user.id} deleted path {family_id}")
 
     await callback.answer(MSG_PATH_DELETED)
 
     # Return to paths menu
-    families = get_families(callback.from_user.id)
-    text = MSG_PATHS_INTRO + "\n\n"
-    if families:
-        for family in families:
-            wishes = get_wishes_in_family(family[0])
-            text += f"🛤 <b>{family[2]}</b> ({len(wishes)} хочу)\n"
-    else:
-        text += MSG_PATHS_EMPTY
-
-    await callback.message.edit_text(text, reply_markup=families_menu_kb(families))
+    text, keyboard = await paths_menu_view(callback.from_user.id)
+    await callback.message.edit_text(text, reply_markup=keyboard)
 
 
 @router.callback_query(F.data.startswith("add_wish_to_path:"))
@@ -114,7 +106,7 @@ async def add_wish_to_path_menu(callback: CallbackQuery, state: FSMContext):
     family_id = int(callback.data.split(":")[1])
     await state.update_data(target_family_id=family_id)
 
-    wishes = get_active_wishes(callback.from_user.id)
+    wishes = await get_active_wishes(callback.from_user.id)
     if not wishes:
         await callback.answer("У вас нет активных «хочу»", show_alert=True)
         return
@@ -132,14 +124,14 @@ async def assign_wish_to_path(callback: CallbackQuery, state: FSMContext):
     wish_id = int(parts[1])
     family_id = int(parts[2])
 
-    set_wish_family(wish_id, family_id)
+    await set_wish_family(wish_id, family_id)
     logger.info(f"User {callback.from_user.id} assigned wish {wish_id} to path {family_id}")
 
     await callback.answer("✅ Добавлено!")
 
     # Return to path view
-    family = get_family(family_id)
-    wishes = get_wishes_in_family(family_id)
+    family = await get_family(family_id)
+    wishes = await get_wishes_in_family(family_id)
 
     text = f"🛤 <b>{family[2]}</b>\n\n"
     if wishes:
@@ -0,0 +1,80 @@
+import html
+import logging
+from aiogram import F
+from aiogram.types import Message, CallbackQuery
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+
+from . import router
+from rendering import get_status_text
+from database.aio import search_goals
+from database.search import MARK_START, MARK_END
+from keyboards.search import search_pages_kb
+from texts import (
+    MSG_SEARCH_USAGE, MSG_SEARCH_EMPTY, MSG_SEARCH_EXPIRED,
+    MSG_SEARCH_TITLE, MSG_SEARCH_ITEM
+)
+
+logger = logging.getLogger(__name__)
+
+
+def highlight_html(text: str) -> str:
+    """Escape text for HTML and turn the search markers into bold"""
+    if not text:
+        return ""
+    return html.escape(text).replace(MARK_START, "<b>").replace(MARK_END, "</b>")
+
+
+def format_search_results(query: str, hits: list, page: int) -> str:
+    text = MSG_SEARCH_TITLE.format(query=html.escape(query), page=page + 1)
+    for hit in hits:
+        reflection = highlight_html(hit.reflection)
+        text += MSG_SEARCH_ITEM.format(
+            date=hit.goal_date,
+            status=get_status_text(hit.status),
+            goal_text=highlight_html(hit.goal_text),
+            reflection=f"💭 {reflection}" if reflection else ""
+        )
+    return text
+
+
+@router.message(Command("search"))
+async def search(message: Message, command: CommandObject, state: FSMContext):
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer(MSG_SEARCH_USAGE)
+        return
+
+    logger.info(f"User {message.from_user.id} searched goals")
+
+    hits, has_more = await search_goals(message.from_user.id, query)
+    if not hits:
+        await message.answer(MSG_SEARCH_EMPTY)
+        return
+
+    # Page buttons find the query in the FSM data
+    await state.update_data(search_query=query)
+    await message.answer(
+        format_search_results(query, hits, 0),
+        reply_markup=search_pages_kb(0, has_more)
+    )
+
+
+@router.callback_query(F.data.startswith("search_page:"))
+async def search_page(callback: CallbackQuery, state: FSMContext):
+    page = int(callback.data.split(":")[1])
+    query = (await state.get_data()).get("search_query")
+    if not query:
+        await callback.answer(MSG_SEARCH_EXPIRED, show_alert=True)
+        return
+
+    hits, has_more = await search_goals(callback.from_user.id, query, page)
+    if not hits:
+        await callback.answer(MSG_SEARCH_EMPTY, show_alert=True)
+        return
+
+    await callback.message.edit_text(
+        format_search_results(query, hits, page),
+        reply_markup=search_pages_kb(page, has_more)
+    )
+    await callback.answer()
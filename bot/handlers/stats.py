@@ -3,7 +3,7 @@ from aiogram.types import Message
 from aiogram.filters import Command
 
 from . import router
-from database import get_user_stats, get_active_wishes
+from database.aio import get_user_stats, get_active_wishes
 from texts import MSG_STATS, MSG_STATS_NO_WISHES
 
 
@@ -18,10 +18,10 @@ def pluralize_days(n: int) -> str:
 
 @router.message(Command("stats"))
 async def show_stats(message: Message):
-    stats = get_user_stats(message.from_user.id)
+    stats = await get_user_stats(message.from_user.id)
 
     # Get wishes for stats
-    active_wishes = get_active_wishes(message.from_user.id)
+    active_wishes = await get_active_wishes(message.from_user.id)
     # Filter out "Без категории"
     user_wishes = [w for w in active_wishes if w[2] != "Без категории"]
 
@@ -7,25 +7,28 @@ from aiogram.enums import ParseMode
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
+from config import MAX_ACTIVE_WISHES
 from . import router
-from .goals import format_goal_card, format_date_ru, get_time_until_midnight, escape_md
-from database import (
+from .goals import format_goal_card
+from rendering import render_empty_card
+from database.aio import (
     create_wish, get_active_wishes, get_all_wishes, get_wish,
     update_wish_status, update_wish_text, delete_wish,
-    count_active_wishes, get_goals_by_wish, get_goal_for_date
+    count_active_wishes, count_done_goals_by_wish, get_wish_history_page,
+    get_goal_view_for_date
 )
 from keyboards.wishes import (
-    wishes_menu_kb, wish_actions_kb, all_wishes_kb, back_to_wishes_kb
+    wishes_menu_kb, wish_actions_kb, all_wishes_kb, wish_history_kb
 )
 from keyboards import main_menu_kb, goal_actions_kb, set_goal_kb, goal_completed_kb
 from texts import (
     MSG_WISHES_INTRO, MSG_WISHES_EMPTY, MSG_WISHES_ACTIVE, MSG_WISHES_CTA,
-    MSG_ENTER_WISH, MSG_WISH_CREATED, MSG_WISH_LIMIT,
+    MSG_ENTER_WISH, MSG_WISH_CREATED, MSG_WISH_LIMIT, MSG_WISH_NOT_FOUND,
     MSG_WISH_UPDATED, MSG_WISH_DELETED, MSG_WISH_CARD,
     MSG_WISH_ACTIVATED, MSG_WISH_DEACTIVATED, MSG_WISH_ARCHIVED,
     MSG_WISH_HISTORY_EMPTY, MSG_WISH_HISTORY_TITLE, MSG_HISTORY_ITEM,
     WISH_STATUS_ACTIVE, WISH_STATUS_INACTIVE, WISH_STATUS_ARCHIVED,
-    MSG_GOAL_CARD_TODAY, MSG_GOAL_CARD_TODAY_EMPTY, MSG_GOAL_CARD_TODAY_DONE,
+    MSG_GOAL_CARD_TODAY, MSG_GOAL_CARD_TODAY_DONE,
     STATUS_PENDING, STATUS_DONE, STATUS_FAILED
 )
 
@@ -59,7 +62,7 @@ def format_wish_card(wish, goals_count: int) -> str:
 async def cmd_wants(message: Message):
     logger.info(f"User {message.from_user.id} opened /wants")
 
-    active_wishes = get_active_wishes(message.from_user.id)
+    active_wishes = await get_active_wishes(message.from_user.id)
 
     text = MSG_WISHES_INTRO + "\n\n"
 
@@ -77,7 +80,7 @@ async def cmd_wants(message: Message):
 
 @router.callback_query(F.data == "wishes_menu")
 async def wishes_menu(callback: CallbackQuery):
-    active_wishes = get_active_wishes(callback.from_user.id)
+    active_wishes = await get_active_wishes(callback.from_user.id)
 
     text = MSG_WISHES_INTRO + "\n\n"
 
@@ -96,7 +99,8 @@ async def wishes_menu(callback: CallbackQuery):
 
 @router.callback_query(F.data == "create_wish")
 async def create_wish_start(callback: CallbackQuery, state: FSMContext):
-    if count_active_wishes(callback.from_user.id) >= 2:
+    # Spares asking for a text that cannot be saved, create_wish enforces the limit
+    if await count_active_wishes(callback.from_user.id) >= MAX_ACTIVE_WISHES:
         await callback.answer(MSG_WISH_LIMIT, show_alert=True)
         return
 
@@ -107,14 +111,19 @@ async def create_wish_start(callback: CallbackQuery, state: FSMContext):
 
 @router.message(WishStates.waiting_for_wish)
 async def save_wish(message: Message, state: FSMContext):
-    create_wish(message.from_user.id, message.text)
-    logger.info(f"User {message.from_user.id} created a wish")
-
+    wish_id = await create_wish(message.from_user.id, message.text)
     await state.clear()
+
+    if wish_id is None:
+        # Another wish became active since the limit was checked
+        await message.answer(MSG_WISH_LIMIT)
+        return
+
+    logger.info(f"User {message.from_user.id} created a wish")
     await message.answer(MSG_WISH_CREATED)
 
     # Show updated wishes menu
-    active_wishes = get_active_wishes(message.from_user.id)
+    active_wishes = await get_active_wishes(message.from_user.id)
     text = MSG_WISHES_INTRO + "\n\n" + MSG_WISHES_ACTIVE
     for wish in active_wishes:
         text += f"\n• {wish[2]}"
@@ -125,7 +134,7 @@ async def save_wish(message: Message, state: FSMContext):
 
 @router.callback_query(F.data == "other_wishes")
 async def show_other_wishes(callback: CallbackQuery):
-    all_wishes = get_all_wishes(callback.from_user.id)
+    all_wishes = await get_all_wishes(callback.from_user.id)
 
     inactive_archived = [w for w in all_wishes if w[3] != "active"]
 
@@ -141,14 +150,14 @@ async def show_other_wishes(callback: CallbackQuery):
 @router.callback_query(F.data.startswith("wish:"))
 async def show_wish(callback: CallbackQuery):
     wish_id = int(callback.data.split(":")[1])
-    wish = get_wish(wish_id)
+    wish = await get_wish(wish_id)
 
     if not wish:
-        await callback.answer("«Хочу» не найдено", show_alert=True)
+        await callback.answer(MSG_WISH_NOT_FOUND, show_alert=True)
         return
 
-    goals = get_goals_by_wish(wish_id)
-    card = format_wish_card(wish, len(goals))
+    goals_count = await count_done_goals_by_wish(wish_id)
+    card = format_wish_card(wish, goals_count)
 
     await callback.message.edit_text(card, reply_markup=wish_actions_kb(wish))
     await callback.answer()
@@ -158,47 +167,54 @@ async def show_wish(callback: CallbackQuery):
 async def activate_wish(callback: CallbackQuery):
     wish_id = int(callback.data.split(":")[1])
 
-    if count_active_wishes(callback.from_user.id) >= 2:
-        await callback.answer(MSG_WISH_LIMIT, show_alert=True)
+    wish = await update_wish_status(wish_id, "active")
+    if not wish:
+        # Only the failure path reads again, to tell the two cases apart
+        limit_reached = await get_wish(wish_id) is not None
+        await callback.answer(MSG_WISH_LIMIT if limit_reached else MSG_WISH_NOT_FOUND, show_alert=True)
         return
 
-    update_wish_status(wish_id, "active")
     logger.info(f"User {callback.from_user.id} activated wish {wish_id}")
 
     await callback.answer(MSG_WISH_ACTIVATED)
 
     # Refresh wish card
-    wish = get_wish(wish_id)
-    goals = get_goals_by_wish(wish_id)
-    card = format_wish_card(wish, len(goals))
+    goals_count = await count_done_goals_by_wish(wish_id)
+    card = format_wish_card(wish, goals_count)
     await callback.message.edit_text(card, reply_markup=wish_actions_kb(wish))
 
 
 @router.callback_query(F.data.startswith("wish_deactivate:"))
 async def deactivate_wish(callback: CallbackQuery):
     wish_id = int(callback.data.split(":")[1])
-    update_wish_status(wish_id, "inactive")
+    wish = await update_wish_status(wish_id, "inactive")
+    if not wish:
+        await callback.answer(MSG_WISH_NOT_FOUND, show_alert=True)
+        return
+
     logger.info(f"User {callback.from_user.id} deactivated wish {wish_id}")
 
     await callback.answer(MSG_WISH_DEACTIVATED)
 
-    wish = get_wish(wish_id)
-    goals = get_goals_by_wish(wish_id)
-    card = format_wish_card(wish, len(goals))
+    goals_count = await count_done_goals_by_wish(wish_id)
+    card = format_wish_card(wish, goals_count)
     await callback.message.edit_text(card, reply_markup=wish_actions_kb(wish))
 
 
 @router.callback_query(F.data.startswith("wish_archive:"))
 async def archive_wish(callback: CallbackQuery):
     wish_id = int(callback.data.split(":")[1])
-    update_wish_status(wish_id, "archived")
+    wish = await update_wish_status(wish_id, "archived")
+    if not wish:
+        await callback.answer(MSG_WISH_NOT_FOUND, show_alert=True)
+        return
+
     logger.info(f"User {callback.from_user.id} archived wish {wish_id}")
 
     await callback.answer(MSG_WISH_ARCHIVED)
 
-    wish = get_wish(wish_id)
-    goals = get_goals_by_wish(wish_id)
-    card = format_wish_card(wish, len(goals))
+    goals_count = await count_done_goals_by_wish(wish_id)
+    card = format_wish_card(wish, goals_count)
     await callback.message.edit_text(card, reply_markup=wish_actions_kb(wish))
 
 
@@ -216,28 +232,30 @@ async def save_edited_wish(message: Message, state: FSMContext):
     data = await state.get_data()
     wish_id = data["edit_wish_id"]
 
-    update_wish_text(wish_id, message.text)
-    logger.info(f"User {message.from_user.id} edited wish {wish_id}")
-
+    wish = await update_wish_text(wish_id, message.text)
     await state.clear()
+    if not wish:
+        await message.answer(MSG_WISH_NOT_FOUND)
+        return
+
+    logger.info(f"User {message.from_user.id} edited wish {wish_id}")
     await message.answer(MSG_WISH_UPDATED)
 
-    wish = get_wish(wish_id)
-    goals = get_goals_by_wish(wish_id)
-    card = format_wish_card(wish, len(goals))
+    goals_count = await count_done_goals_by_wish(wish_id)
+    card = format_wish_card(wish, goals_count)
     await message.answer(card, reply_markup=wish_actions_kb(wish))
 
 
 @router.callback_query(F.data.startswith("wish_delete:"))
 async def delete_wish_handler(callback: CallbackQuery):
     wish_id = int(callback.data.split(":")[1])
-    delete_wish(wish_id)
+    await delete_wish(wish_id)
     logger.info(f"User {callback.from_user.id} deleted wish {wish_id}")
 
     await callback.answer(MSG_WISH_DELETED)
 
     # Return to wishes menu
-    active_wishes = get_active_wishes(callback.from_user.id)
+    active_wishes = await get_active_wishes(callback.from_user.id)
     text = MSG_WISHES_INTRO + "\n\n"
     if active_wishes:
         text += MSG_WISHES_ACTIVE
@@ -255,10 +273,10 @@ async def back_to_main(callback: CallbackQuery):
     await callback.message.delete()
 
     today = date.today()
-    goal = get_goal_for_date(callback.from_user.id, today)
+    goal = await get_goal_view_for_date(callback.from_user.id, today)
 
     if goal:
-        if goal[4] == "done":
+        if goal.status == "done":
             # Show completed goal
             await callback.message.answer(
                 format_goal_card(goal, is_today=True, use_done_template=True),
@@ -269,15 +287,12 @@ async def back_to_main(callback: CallbackQuery):
             # Show pending goal
             await callback.message.answer(
                 format_goal_card(goal, is_today=True),
-                reply_markup=goal_actions_kb(goal[0]),
+                reply_markup=goal_actions_kb(goal.id),
                 parse_mode=ParseMode.MARKDOWN_V2
             )
     else:
         # No goal - show empty card
-        empty_card = MSG_GOAL_CARD_TODAY_EMPTY.format(
-            date=escape_md(format_date_ru(today)),
-            time_left=get_time_until_midnight()
-        )
+        empty_card = render_empty_card(today)
         await callback.message.answer(empty_card, reply_markup=set_goal_kb(), parse_mode=ParseMode.MARKDOWN_V2)
 
     await callback.answer()
@@ -285,18 +300,27 @@ async def back_to_main(callback: CallbackQuery):
 
 @router.callback_query(F.data.startswith("wish_history:"))
 async def show_wish_history(callback: CallbackQuery):
-    wish_id = int(callback.data.split(":")[1])
-    wish = get_wish(wish_id)
-    goals = get_goals_by_wish(wish_id)
-
-    if not goals:
+    # wish_history:<wish_id>[:<o|n>:<goal_date>:<goal_id>] - newest page, or
+    # the page older / newer than the given entry
+    parts = callback.data.split(":")
+    wish_id = int(parts[1])
+    after, older = None, True
+    if len(parts) == 5:
+        after, older = (parts[3], int(parts[4])), parts[2] == "o"
+
+    wish = await get_wish(wish_id)
+    page = await get_wish_history_page(wish_id, after, older)
+    if not page.entries and after is not None:
+        # The entries around the cursor are gone, start over
+        page = await get_wish_history_page(wish_id)
+
+    if not wish or not page.entries:
         await callback.answer(MSG_WISH_HISTORY_EMPTY, show_alert=True)
         return
 
     text = MSG_WISH_HISTORY_TITLE.format(wish_text=wish[2])
 
-    for goal in goals[:20]:  # Limit to 20 entries
-        goal_id, user_id, goal_date, goal_text, status, created_at, completed_at, locked, wish_id_g, family_snapshot, reflection = goal
+    for goal_id, goal_date, goal_text, reflection in page.entries:
         reflection_text = f"💭 {reflection}" if reflection else ""
         text += MSG_HISTORY_ITEM.format(
             date=goal_date,
@@ -304,5 +328,5 @@ async def show_wish_history(callback: CallbackQuery):
             reflection=reflection_text
         )
 
-    await callback.message.edit_text(text, reply_markup=back_to_wishes_kb(wish_id))
+    await callback.message.edit_text(text, reply_markup=wish_history_kb(wish_id, page))
     await callback.answer()
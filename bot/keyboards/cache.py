@@ -0,0 +1,55 @@
+"""Shared keyboard instances and their serialized form.
+
+Keyboard functions decorated with cached_keyboard return the same markup
+object for the same arguments, so the pydantic model is built and
+validated once. The markups are shared: never modify one after creation.
+KeyboardCachingSession sends a shared markup's JSON serialized once,
+instead of dumping the model again for every message.
+"""
+import functools
+import weakref
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
+
+from config import KEYBOARD_CACHE_SIZE
+
+# id(shared markup) -> its JSON, None until first sent.
+# Entries are removed when the markup is garbage collected.
+_serialized = {}
+
+
+def _share(markup):
+    _serialized[id(markup)] = None
+    weakref.finalize(markup, _serialized.pop, id(markup), None)
+    return markup
+
+
+def cached_keyboard(func):
+    """Memoize a keyboard function (LRU of KEYBOARD_CACHE_SIZE per function)"""
+    @functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+    def build(*args):
+        return _share(func(*args))
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        return build(*args)
+
+    wrapper.cache_info = build.cache_info
+    return wrapper
+
+
+class KeyboardCachingSession(AiohttpSession):
+    def build_form_data(self, bot: Bot, method: TelegramMethod):
+        markup = getattr(method, "reply_markup", None)
+        if markup is None or id(markup) not in _serialized:
+            return super().build_form_data(bot, method)
+
+        serialized = _serialized[id(markup)]
+        if serialized is None:
+            serialized = _serialized[id(markup)] = self.prepare_value(markup, bot=bot, files={})
+
+        form = super().build_form_data(bot, method.model_copy(update={"reply_markup": None}))
+        form.add_field("reply_markup", serialized)
+        return form
@@ -1,4 +1,5 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from .cache import cached_keyboard
 from texts import BTN_CREATE_PATH, BTN_BACK, BTN_WISH_DELETE
 
 
@@ -6,10 +7,9 @@ def families_menu_kb(families: list):
     keyboard = []
 
     for family in families:
-        family_id, user_id, name, created_at = family
         keyboard.append([InlineKeyboardButton(
-            text=f"🛤 {name}",
-            callback_data=f"path:{family_id}"
+            text=f"🛤 {family.name}",
+            callback_data=f"path:{family.id}"
         )])
 
     keyboard.append([InlineKeyboardButton(text=BTN_CREATE_PATH, callback_data="create_path")])
@@ -18,6 +18,7 @@ def families_menu_kb(families: list):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@cached_keyboard
 def family_actions_kb(family_id: int):
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="➕ Добавить хочу", callback_data=f"add_wish_to_path:{family_id}")],
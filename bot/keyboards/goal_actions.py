@@ -1,7 +1,9 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from .cache import cached_keyboard
 from texts import BTN_DONE, BTN_UNDONE, BTN_EDIT, BTN_DELETE, BTN_SET_GOAL, BTN_CANCEL, BTN_GOAL_TOMORROW
 
 
+@cached_keyboard
 def set_goal_kb():
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -10,6 +12,7 @@ def set_goal_kb():
     )
 
 
+@cached_keyboard
 def cancel_goal_kb():
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -18,6 +21,7 @@ def cancel_goal_kb():
     )
 
 
+@cached_keyboard
 def set_goal_kb_tomorrow():
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -26,6 +30,7 @@ def set_goal_kb_tomorrow():
     )
 
 
+@cached_keyboard
 def cancel_goal_kb_tomorrow():
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -34,6 +39,7 @@ def cancel_goal_kb_tomorrow():
     )
 
 
+@cached_keyboard
 def goal_actions_kb(goal_id: int):
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -46,6 +52,7 @@ def goal_actions_kb(goal_id: int):
     )
 
 
+@cached_keyboard
 def goal_done_actions_kb(goal_id: int):
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -55,6 +62,7 @@ def goal_done_actions_kb(goal_id: int):
     )
 
 
+@cached_keyboard
 def goal_completed_kb():
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -1,7 +1,9 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from .cache import cached_keyboard
 from texts import BTN_GOAL_TODAY, BTN_GOAL_TOMORROW
 
 
+@cached_keyboard
 def main_menu_kb():
     return ReplyKeyboardMarkup(
         keyboard=[
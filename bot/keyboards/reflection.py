@@ -1,7 +1,9 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from .cache import cached_keyboard
 from texts import BTN_SKIP_REFLECTION
 
 
+@cached_keyboard
 def reflection_kb(goal_id: int):
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text=BTN_SKIP_REFLECTION, callback_data=f"skip_reflect:{goal_id}")]
@@ -0,0 +1,13 @@
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from .cache import cached_keyboard
+from texts import BTN_SEARCH_PREV, BTN_SEARCH_NEXT
+
+
+@cached_keyboard
+def search_pages_kb(page: int, has_more: bool):
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(text=BTN_SEARCH_PREV, callback_data=f"search_page:{page - 1}"))
+    if has_more:
+        buttons.append(InlineKeyboardButton(text=BTN_SEARCH_NEXT, callback_data=f"search_page:{page + 1}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons] if buttons else [])
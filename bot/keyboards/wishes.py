@@ -1,8 +1,10 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from .cache import cached_keyboard
 from texts import (
     BTN_CREATE_WISH, BTN_OTHER_WISHES, BTN_BACK, BTN_PATHS,
     BTN_WISH_HISTORY, BTN_WISH_EDIT, BTN_WISH_DELETE,
-    BTN_WISH_ACTIVATE, BTN_WISH_DEACTIVATE, BTN_WISH_ARCHIVE
+    BTN_WISH_ACTIVATE, BTN_WISH_DEACTIVATE, BTN_WISH_ARCHIVE,
+    BTN_HISTORY_NEWER, BTN_HISTORY_OLDER
 )
 
 
@@ -61,7 +63,11 @@ def all_wishes_kb(wishes: list):
 
 def wish_actions_kb(wish):
     wish_id, user_id, text, status, family_id, created_at, archived_at, position = wish
+    return _wish_actions_kb(wish_id, status)
 
+
+@cached_keyboard
+def _wish_actions_kb(wish_id: int, status: str):
     keyboard = []
 
     # History button
@@ -95,10 +101,29 @@ def wish_actions_kb(wish):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def back_to_wishes_kb(wish_id: int):
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=BTN_BACK, callback_data=f"wish:{wish_id}")]
-    ])
+def wish_history_kb(wish_id: int, page):
+    keyboard = []
+
+    # Keyset cursors: the first and the last entry shown
+    pages = []
+    if page.has_newer:
+        goal_id, goal_date = page.entries[0][:2]
+        pages.append(InlineKeyboardButton(
+            text=BTN_HISTORY_NEWER,
+            callback_data=f"wish_history:{wish_id}:n:{goal_date}:{goal_id}"
+        ))
+    if page.has_older:
+        goal_id, goal_date = page.entries[-1][:2]
+        pages.append(InlineKeyboardButton(
+            text=BTN_HISTORY_OLDER,
+            callback_data=f"wish_history:{wish_id}:o:{goal_date}:{goal_id}"
+        ))
+    if pages:
+        keyboard.append(pages)
+
+    keyboard.append([InlineKeyboardButton(text=BTN_BACK, callback_data=f"wish:{wish_id}")])
+
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
 def select_wish_kb(wishes: list):
@@ -2,13 +2,19 @@ import asyncio
 import logging
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
-from aiogram.types import BotCommand, BotCommandScopeChat
 from aiogram.client.default import DefaultBotProperties
 
-from config import BOT_TOKEN, LOGS_DIR, ADMINS_FILE
+from config import BOT_TOKEN, BOT_MODE, LOGS_DIR
 from handlers import router
+from keyboards.cache import KeyboardCachingSession
+from admins import USER_COMMANDS, sync_admin_commands
 from database.db import init_db
+from database import aio as db_aio
+import charts
 from scheduler import setup_scheduler
+from fsm_storage import SQLiteStorage
+from webhook import check_config as check_webhook_config, run_webhook
+from middlewares import UserLockMiddleware, ThrottlingMiddleware
 
 # Setup logging
 LOGS_DIR.mkdir(exist_ok=True)
@@ -24,41 +30,12 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def get_admin_ids() -> list[int]:
-    if not ADMINS_FILE.exists():
-        return []
-    with open(ADMINS_FILE, "r") as f:
-        return [int(line.strip()) for line in f if line.strip() and not line.startswith("#")]
-
-
 async def set_bot_commands(bot: Bot):
     # Default commands for all users
-    user_commands = [
-        BotCommand(command="start", description="Запустить бота"),
-        BotCommand(command="wants", description="Мои хочу"),
-        BotCommand(command="stats", description="Статистика"),
-        BotCommand(command="help", description="Помощь"),
-    ]
-
-    # Admin commands
-    admin_commands = user_commands + [
-        BotCommand(command="admin_stats", description="Статистика бота"),
-        BotCommand(command="admin_export", description="Экспорт данных"),
-        BotCommand(command="admin_metric", description="График активности"),
-    ]
-
-    # Set default commands for all users
-    await bot.set_my_commands(user_commands)
+    await bot.set_my_commands(USER_COMMANDS)
 
-    # Set extended commands for admins
-    for admin_id in get_admin_ids():
-        try:
-            await bot.set_my_commands(
-                admin_commands,
-                scope=BotCommandScopeChat(chat_id=admin_id)
-            )
-        except Exception as e:
-            logger.warning(f"Could not set commands for admin {admin_id}: {e}")
+    # Extended commands for admins, kept in sync by the scheduler
+    await sync_admin_commands(bot)
 
     logger.info("Bot commands configured")
 
@@ -66,23 +43,47 @@ async def set_bot_commands(bot: Bot):
 async def main():
     logger.info("Bot starting...")
 
+    if BOT_MODE == "webhook":
+        check_webhook_config()
+
     init_db()
 
     bot = Bot(
         token=BOT_TOKEN,
+        session=KeyboardCachingSession(),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
-    dp = Dispatcher()
+    # FSM middleware is registered by hand to run after the user lock,
+    # so each update reads the state left by the previous one
+    dp = Dispatcher(storage=SQLiteStorage(), disable_fsm=True)
+    dp["user_locks"] = UserLockMiddleware()
+    dp.update.outer_middleware(dp["user_locks"])
+    dp.update.outer_middleware(dp.fsm)
+    dp["throttling"] = ThrottlingMiddleware()
+    dp.message.middleware(dp["throttling"])
+    dp.callback_query.middleware(dp["throttling"])
     dp.include_router(router)
 
     # Set bot commands (Menu Button)
     await set_bot_commands(bot)
 
+    # Chart worker imports matplotlib while the bot starts
+    charts.start()
+
     scheduler = setup_scheduler(bot)
     scheduler.start()
     logger.info("Scheduler started")
 
-    await dp.start_polling(bot)
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            # A webhook left from webhook mode would block getUpdates
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        charts.shutdown()
+        db_aio.shutdown()
 
 
 if __name__ == "__main__":
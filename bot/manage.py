@@ -0,0 +1,302 @@
+"""Maintenance commands, run from the bot directory:
+
+    python manage.py backfill-stats
+    python manage.py backfill-metrics
+    python manage.py rebuild-family-counters
+    python manage.py export-changes --since 0 --out exports
+    python manage.py bench-webhook --count 5000 --concurrency 50
+    python manage.py rebuild-search
+    python manage.py bench-search --rows 2000000
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import random
+import statistics
+import time
+from datetime import date
+from pathlib import Path
+
+import aiohttp
+
+from database import db
+from database.db import init_db, transaction
+from database.families import rebuild_family_counters
+from database.user_stats import backfill_user_stats
+from database.daily_metrics import backfill_daily_metrics
+from database.export import export_goal_changes
+from database.search import search_goals, rebuild_search_index
+from config import BASE_DIR, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+from webhook import HEALTH_PATH
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+
+def cmd_backfill_stats(args):
+    count = backfill_user_stats()
+    print(f"user_stats rebuilt for {count} users")
+
+
+def cmd_backfill_metrics(args):
+    count = backfill_daily_metrics()
+    print(f"daily_metrics rebuilt for {count} days")
+
+
+def cmd_rebuild_family_counters(args):
+    with transaction() as cursor:
+        rebuild_family_counters(cursor)
+    print("family counters rebuilt")
+
+
+def cmd_export_changes(args):
+    directory = Path(args.out)
+    directory.mkdir(parents=True, exist_ok=True)
+    files, watermark = export_goal_changes(directory, args.since)
+    for path in files:
+        print(path)
+    # Last line for scripts: the watermark to pass next time
+    print(watermark)
+
+
+# Synthetic users get ids far above real Telegram ones
+BENCH_USER_ID_BASE = 9_000_000_000
+
+
+def bench_update(update_id: int, user_id: int, text: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "Bench"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": "Bench"},
+            "from": user,
+            "text": text
+        }
+    }
+
+
+async def bench_webhook(base_url: str, count: int, concurrency: int, users: int, text: str):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET} if WEBHOOK_SECRET else {}
+    update_ids = iter(range(1, count + 1))
+    failed = 0
+
+    async with aiohttp.ClientSession(base_url, headers=headers) as session:
+        async with session.get(HEALTH_PATH) as response:
+            processed_before = (await response.json())["processed"]
+
+        async def sender():
+            nonlocal failed
+            for update_id in update_ids:
+                update = bench_update(update_id, BENCH_USER_ID_BASE + update_id % users, text)
+                async with session.post(WEBHOOK_PATH, json=update) as response:
+                    if response.status != 200:
+                        failed += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(sender() for _ in range(concurrency)))
+        accepted_in = time.monotonic() - started
+
+        # Accepted updates are still being processed, wait for the server to drain
+        while True:
+            async with session.get(HEALTH_PATH) as response:
+                health = await response.json()
+            if health["in_flight"] == 0:
+                break
+            await asyncio.sleep(0.05)
+        processed_in = time.monotonic() - started
+
+    processed = health["processed"] - processed_before
+    print(f"{count} updates posted, {failed} rejected, accepted in {accepted_in:.2f}s")
+    print(f"{processed} processed in {processed_in:.2f}s ({processed / processed_in:.0f} updates/s)")
+
+
+def cmd_bench_webhook(args):
+    asyncio.run(bench_webhook(args.url, args.count, args.concurrency, args.users, args.text))
+
+
+def cmd_rebuild_search(args):
+    seconds = rebuild_search_index()
+    print(f"search index rebuilt in {seconds:.1f}s")
+
+
+BENCH_SEARCH_BATCH_SIZE = 50000
+
+
+def bench_vocabulary(size: int) -> list:
+    syllables = ["ба", "ве", "го", "да", "же", "зи", "ко", "ла", "ми", "но", "пу", "ре", "са", "ту", "фе", "чи"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(random.choices(syllables, k=random.randint(2, 4))))
+    # Shuffled, so word frequency does not depend on the spelling
+    words = sorted(words)
+    random.shuffle(words)
+    return words
+
+
+def bench_text(vocabulary: list, cum_weights: list, low: int, high: int) -> str:
+    return " ".join(random.choices(vocabulary, cum_weights=cum_weights, k=random.randint(low, high)))
+
+
+def fill_bench_goals(rows: int, users: int, vocabulary: list, cum_weights: list):
+    goals_per_user = -(-rows // users)
+    first_day = date(2020, 1, 1).toordinal()
+    with transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (user_id, first_name) VALUES (?, 'Bench')",
+            [(BENCH_USER_ID_BASE + user,) for user in range(users)]
+        )
+        cursor.execute(
+            """CREATE TEMP TABLE bench_goals (
+                   user_id INTEGER, goal_date DATE, goal_text TEXT, status TEXT, reflection_text TEXT
+               )"""
+        )
+
+    done = 0
+    while done < rows:
+        batch = []
+        for row in range(done, min(rows, done + BENCH_SEARCH_BATCH_SIZE)):
+            user, day = divmod(row, goals_per_user)
+            reflection = bench_text(vocabulary, cum_weights, 5, 15) if row % 2 else None
+            batch.append((
+                BENCH_USER_ID_BASE + user,
+                date.fromordinal(first_day + day).isoformat(),
+                bench_text(vocabulary, cum_weights, 3, 8),
+                "done" if row % 3 else "failed",
+                reflection
+            ))
+        # One INSERT ... SELECT per batch: the triggers still index every
+        # row, but FTS5 flushes once per statement instead of once per row
+        with transaction() as cursor:
+            cursor.executemany("INSERT INTO temp.bench_goals VALUES (?, ?, ?, ?, ?)", batch)
+            cursor.execute(
+                """INSERT INTO goals (user_id, goal_date, goal_text, status, reflection_text)
+                   SELECT * FROM temp.bench_goals"""
+            )
+            cursor.execute("DELETE FROM temp.bench_goals")
+        done += len(batch)
+        print(f"  {done} goals", end="\r", flush=True)
+    print()
+
+
+def percentiles(timings: list) -> str:
+    timings = sorted(timings)
+    return (
+        f"p50 {statistics.median(timings):.2f}ms, "
+        f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f}ms, max {timings[-1]:.2f}ms"
+    )
+
+
+def cmd_bench_search(args):
+    # A scratch database, never the bot's own
+    path = Path(args.db)
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    db.DB_PATH = path
+    init_db()
+
+    random.seed(args.seed)
+    vocabulary = bench_vocabulary(args.vocabulary)
+    # Zipf-like word frequencies, as in real text
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    started = time.monotonic()
+    fill_bench_goals(args.rows, args.users, vocabulary, cum_weights)
+    print(f"{args.rows} goals inserted in {time.monotonic() - started:.1f}s")
+
+    print(f"index rebuilt and optimized in {rebuild_search_index():.1f}s")
+
+    timings = []
+    for _ in range(args.queries):
+        user_id = BENCH_USER_ID_BASE + random.randrange(args.users)
+        query = " ".join(random.choices(vocabulary, cum_weights=cum_weights, k=random.randint(1, 2)))
+        # Users often type only the start of a word
+        if random.random() < 0.3:
+            query = query[:random.randint(3, len(query))]
+        started = time.perf_counter()
+        search_goals(user_id, query)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"{args.queries} searches: {percentiles(timings)}")
+
+    # Cost the index adds to a goal write (one transaction per goal, as in the bot)
+    timings = []
+    for number in range(args.queries):
+        started = time.perf_counter()
+        with transaction() as cursor:
+            cursor.execute(
+                "INSERT INTO goals (user_id, goal_date, goal_text) VALUES (?, '2100-01-01', ?)",
+                (BENCH_USER_ID_BASE + number, bench_text(vocabulary, cum_weights, 3, 8))
+            )
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"{args.queries} goal writes: {percentiles(timings)}")
+
+    # The same kind of query as a LIKE scan, for comparison
+    user_id = BENCH_USER_ID_BASE + random.randrange(args.users)
+    word = random.choice(vocabulary[:100])
+    started = time.perf_counter()
+    db.get_connection().execute(
+        "SELECT id FROM goals WHERE user_id = ? AND (goal_text LIKE ? OR reflection_text LIKE ?)",
+        (user_id, f"%{word}%", f"%{word}%")
+    ).fetchall()
+    by_user = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    db.get_connection().execute(
+        "SELECT COUNT(*) FROM goals WHERE goal_text LIKE ? OR reflection_text LIKE ?",
+        (f"%{word}%", f"%{word}%")
+    ).fetchall()
+    print(f"LIKE: {by_user:.2f}ms over one user's goals, {(time.perf_counter() - started) * 1000:.0f}ms over the table")
+
+    db.close_connections()
+    if not args.keep:
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Goal bot maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill_stats = commands.add_parser("backfill-stats", help="Rebuild user_stats from the goals table (switches the admin totals to it)")
+    backfill_stats.set_defaults(func=cmd_backfill_stats)
+
+    backfill_metrics = commands.add_parser("backfill-metrics", help="Rebuild daily_metrics from goals and users")
+    backfill_metrics.set_defaults(func=cmd_backfill_metrics)
+
+    family_counters = commands.add_parser("rebuild-family-counters", help="Recount wishes and done goals of every path")
+    family_counters.set_defaults(func=cmd_rebuild_family_counters)
+
+    export_changes = commands.add_parser("export-changes", help="Export goals changed after a watermark")
+    export_changes.add_argument("--since", type=int, default=0, help="watermark of the previous export")
+    export_changes.add_argument("--out", default=".", help="directory for the CSV files")
+    export_changes.set_defaults(func=cmd_export_changes)
+
+    bench = commands.add_parser("bench-webhook", help="POST synthetic updates to a running webhook server")
+    bench.add_argument("--url", default=f"http://127.0.0.1:{WEBHOOK_PORT}", help="server base URL")
+    bench.add_argument("--count", type=int, default=1000, help="updates to send")
+    bench.add_argument("--concurrency", type=int, default=20, help="parallel requests")
+    bench.add_argument("--users", type=int, default=100, help="distinct synthetic users")
+    bench.add_argument("--text", default="bench", help="message text, the default matches no handler")
+    bench.set_defaults(func=cmd_bench_webhook)
+
+    search_index = commands.add_parser("rebuild-search", help="Build (after upgrading) or rebuild and optimize the goal search index")
+    search_index.set_defaults(func=cmd_rebuild_search)
+
+    bench_search = commands.add_parser("bench-search", help="Time /search on a scratch database of synthetic goals")
+    bench_search.add_argument("--db", default=str(BASE_DIR / "bench_search.db"), help="scratch database, overwritten")
+    bench_search.add_argument("--rows", type=int, default=2_000_000, help="goals to generate")
+    bench_search.add_argument("--users", type=int, default=20_000, help="users owning them")
+    bench_search.add_argument("--vocabulary", type=int, default=5000, help="distinct words")
+    bench_search.add_argument("--queries", type=int, default=500, help="searches to time")
+    bench_search.add_argument("--seed", type=int, default=1)
+    bench_search.add_argument("--keep", action="store_true", help="keep the scratch database")
+    bench_search.set_defaults(func=cmd_bench_search, scratch_db=True)
+
+    args = parser.parse_args()
+    if not getattr(args, "scratch_db", False):
+        init_db()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
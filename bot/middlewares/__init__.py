@@ -0,0 +1,2 @@
+from .user_lock import UserLockMiddleware
+from .throttling import ThrottlingMiddleware
@@ -0,0 +1,108 @@
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject
+
+from config import THROTTLE_USER, THROTTLE_HANDLERS, THROTTLE_TABLE_SIZE
+from texts import MSG_THROTTLED
+
+logger = logging.getLogger(__name__)
+
+# Bucket key for the limit over all handlers of a user
+_ALL_HANDLERS = "*"
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, capacity: float, rate: float, now: float):
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Token buckets per user and per (user, handler).
+
+    Register as an inner middleware of messages and callback queries, so
+    the matched handler is known. Excess messages are dropped; excess
+    callbacks are only answered, which stops the button spinner without
+    touching the database. The bucket table is an LRU of table_size
+    entries; an evicted bucket simply starts full again.
+    """
+
+    def __init__(
+        self,
+        user_limit: Tuple[float, float] = THROTTLE_USER,
+        handler_limits: Dict[str, Tuple[float, float]] = THROTTLE_HANDLERS,
+        table_size: int = THROTTLE_TABLE_SIZE
+    ):
+        self.user_limit = user_limit
+        self.handler_limits = handler_limits
+        self.table_size = table_size
+        # (user_id, handler name) -> _Bucket
+        self._buckets = OrderedDict()
+        self.throttled = Counter()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        handler_object = data.get("handler")
+        if user is None or handler_object is None:
+            return await handler(event, data)
+
+        name = handler_object.callback.__name__
+        if self._allow(user.id, name):
+            return await handler(event, data)
+
+        self.throttled[name] += 1
+        logger.debug(f"Throttled {name} for {user.id}")
+        if isinstance(event, CallbackQuery):
+            await event.answer(MSG_THROTTLED)
+        return None
+
+    def _allow(self, user_id: int, name: str) -> bool:
+        now = time.monotonic()
+        # Both buckets are charged only when both have a token
+        buckets = [(self._bucket(user_id, _ALL_HANDLERS, now), self.user_limit)]
+        limit = self.handler_limits.get(name)
+        if limit is not None:
+            buckets.append((self._bucket(user_id, name, now), limit))
+
+        for bucket, (capacity, rate) in buckets:
+            bucket.refill(capacity, rate, now)
+        if any(bucket.tokens < 1 for bucket, _ in buckets):
+            return False
+
+        for bucket, _ in buckets:
+            bucket.tokens -= 1
+        return True
+
+    def _bucket(self, user_id: int, name: str, now: float) -> _Bucket:
+        key = (user_id, name)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            capacity = (self.user_limit if name == _ALL_HANDLERS else self.handler_limits[name])[0]
+            bucket = self._buckets[key] = _Bucket(capacity, now)
+            while len(self._buckets) > self.table_size:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def metrics(self) -> dict:
+        return {
+            "buckets": len(self._buckets),
+            "table_size": self.table_size,
+            "throttled": dict(self.throttled)
+        }
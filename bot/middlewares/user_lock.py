@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from config import USER_QUEUE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+class _UserQueue:
+    __slots__ = ("lock", "depth")
+
+    def __init__(self):
+        # asyncio.Lock wakes waiters in arrival order
+        self.lock = asyncio.Lock()
+        # Updates running or waiting for this user
+        self.depth = 0
+
+
+class UserLockMiddleware(BaseMiddleware):
+    """Process one user's updates in order, different users in parallel.
+
+    Register as an update outer middleware before the FSM middleware, so
+    the FSM state is read only once the previous update has finished.
+    A user's queue exists only while they have updates in flight, and
+    updates beyond max_depth are dropped (e.g. a burst of double-taps).
+    """
+
+    def __init__(self, max_depth: int = USER_QUEUE_LIMIT):
+        self.max_depth = max_depth
+        self._queues: Dict[int, _UserQueue] = {}
+        self.peak_depth = 0
+        self.dropped = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        queue = self._queues.get(user.id)
+        if queue is None:
+            queue = self._queues[user.id] = _UserQueue()
+
+        if queue.depth >= self.max_depth:
+            self.dropped += 1
+            logger.warning(f"Dropped update from {user.id}: {queue.depth} updates already queued")
+            return None
+
+        queue.depth += 1
+        self.peak_depth = max(self.peak_depth, queue.depth)
+        try:
+            async with queue.lock:
+                return await handler(event, data)
+        finally:
+            queue.depth -= 1
+            if queue.depth == 0:
+                del self._queues[user.id]
+
+    def metrics(self) -> dict:
+        depths = [queue.depth for queue in self._queues.values()]
+        return {
+            "active_users": len(depths),
+            "waiting": sum(depths) - len(depths),
+            "max_depth": max(depths, default=0),
+            "peak_depth": self.peak_depth,
+            "dropped": self.dropped
+        }
@@ -0,0 +1,176 @@
+"""MarkdownV2 rendering of goal cards and reminders.
+
+The MSG_* texts are already valid MarkdownV2, they are parsed once into
+Templates; only the values filled in at render time are escaped.
+"""
+from datetime import date, datetime, timedelta
+from string import Formatter
+
+from texts import (
+    MSG_GOAL_CARD_TODAY, MSG_GOAL_CARD_TODAY_EMPTY, MSG_GOAL_CARD_TODAY_INPUT, MSG_GOAL_CARD_TODAY_DONE,
+    MSG_GOAL_CARD_TOMORROW, MSG_GOAL_CARD_TOMORROW_EMPTY, MSG_GOAL_CARD_TOMORROW_INPUT,
+    MSG_REMINDER_WITH_GOAL, MSG_EVENING_REMINDER, DEFAULT_WISH_TEXT,
+    STATUS_PENDING, STATUS_DONE, STATUS_FAILED
+)
+
+MONTHS_RU = {
+    1: "января", 2: "февраля", 3: "марта", 4: "апреля",
+    5: "мая", 6: "июня", 7: "июля", 8: "августа",
+    9: "сентября", 10: "октября", 11: "ноября", 12: "декабря"
+}
+
+# Every character MarkdownV2 reserves, the backslash included
+_MD_ESCAPES = str.maketrans({char: f"\\{char}" for char in "\\_*[]()~`>#+-=|{}.!"})
+
+
+def escape_md(text: str) -> str:
+    """Escape special characters for MarkdownV2"""
+    return text.translate(_MD_ESCAPES)
+
+
+def format_date_ru(d: date) -> str:
+    return f"{d.day} {MONTHS_RU[d.month]}"
+
+
+def get_time_until_midnight(now: datetime = None) -> str:
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    delta = midnight - now
+    hours, remainder = divmod(delta.seconds, 3600)
+    minutes, _ = divmod(remainder, 60)
+    return f"{hours} ч {minutes} мин"
+
+
+def get_status_text(status: str) -> str:
+    return {
+        "pending": STATUS_PENDING,
+        "done": STATUS_DONE,
+        "failed": STATUS_FAILED
+    }.get(status, status)
+
+
+class Template:
+    """A format string split into literal parts and fields once.
+
+    Values of the fields listed in escaped are passed through escape_md.
+    """
+
+    def __init__(self, text: str, escaped=(), strip: bool = False):
+        if strip:
+            text = text.strip()
+        # [(literal, field name or None)]
+        self._parts = [(literal, field) for literal, field, _, _ in Formatter().parse(text)]
+        self.escaped = frozenset(escaped)
+
+    def render(self, **values) -> str:
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field is not None:
+                out.append(self._value(field, values[field]))
+        return "".join(out)
+
+    def partial(self, **values) -> "Template":
+        """Fill some fields now, the rest stay open"""
+        template = Template("", self.escaped)
+        parts = []
+        pending = ""
+        for literal, field in self._parts:
+            pending += literal
+            if field is None:
+                continue
+            if field in values:
+                pending += self._value(field, values[field])
+            else:
+                parts.append((pending, field))
+                pending = ""
+        if pending:
+            parts.append((pending, None))
+        template._parts = parts
+        return template
+
+    def _value(self, field: str, value) -> str:
+        value = str(value)
+        return escape_md(value) if field in self.escaped else value
+
+
+GOAL_CARD_TODAY = Template(MSG_GOAL_CARD_TODAY, escaped=("date", "goal_text"), strip=True)
+GOAL_CARD_TODAY_DONE = Template(MSG_GOAL_CARD_TODAY_DONE, escaped=("date", "goal_text", "reflection"), strip=True)
+GOAL_CARD_TODAY_EMPTY = Template(MSG_GOAL_CARD_TODAY_EMPTY, escaped=("date",))
+GOAL_CARD_TODAY_INPUT = Template(MSG_GOAL_CARD_TODAY_INPUT, escaped=("date",))
+GOAL_CARD_TOMORROW = Template(MSG_GOAL_CARD_TOMORROW, escaped=("date", "goal_text"), strip=True)
+GOAL_CARD_TOMORROW_EMPTY = Template(MSG_GOAL_CARD_TOMORROW_EMPTY, escaped=("date",))
+GOAL_CARD_TOMORROW_INPUT = Template(MSG_GOAL_CARD_TOMORROW_INPUT, escaped=("date",))
+REMINDER_WITH_GOAL = Template(
+    MSG_REMINDER_WITH_GOAL + "\n\n" + MSG_GOAL_CARD_TODAY.strip(),
+    escaped=("date", "goal_text")
+)
+EVENING_REMINDER = Template(MSG_EVENING_REMINDER)
+
+
+def render_goal_card(
+    goal_date: date,
+    goal_text: str,
+    status: str,
+    reflection: str = None,
+    wish_text: str = None,
+    is_today: bool = True,
+    use_done_template: bool = False
+) -> str:
+    wish_line = ""
+    if wish_text and wish_text != DEFAULT_WISH_TEXT:
+        wish_line = f"\n💫 {escape_md(wish_text)}"
+
+    date_formatted = format_date_ru(goal_date)
+
+    if not is_today:
+        card = GOAL_CARD_TOMORROW.render(
+            date=date_formatted, goal_text=goal_text, status=get_status_text(status)
+        )
+    elif use_done_template and status == "done":
+        card = GOAL_CARD_TODAY_DONE.render(
+            date=date_formatted, goal_text=goal_text, reflection=reflection or ""
+        )
+    else:
+        card = GOAL_CARD_TODAY.render(
+            date=date_formatted, goal_text=goal_text,
+            status=get_status_text(status), time_left=get_time_until_midnight()
+        )
+
+    return card + wish_line
+
+
+def render_empty_card(goal_date: date, is_today: bool = True, input_mode: bool = False) -> str:
+    """Card of a day without a goal; input_mode asks the user to type one"""
+    if is_today:
+        template = GOAL_CARD_TODAY_INPUT if input_mode else GOAL_CARD_TODAY_EMPTY
+        return template.render(date=format_date_ru(goal_date), time_left=get_time_until_midnight())
+
+    template = GOAL_CARD_TOMORROW_INPUT if input_mode else GOAL_CARD_TOMORROW_EMPTY
+    return template.render(date=format_date_ru(goal_date))
+
+
+class ReminderRenderer:
+    """Reminder texts of one broadcast.
+
+    The date, status and time left are the same for every recipient, so
+    they are filled in once and each message only adds its own fields.
+    """
+
+    def __init__(self, goal_date: date, now: datetime = None):
+        date_formatted = format_date_ru(goal_date)
+        time_left = get_time_until_midnight(now)
+
+        self._with_goal = REMINDER_WITH_GOAL.partial(
+            date=date_formatted, status=STATUS_PENDING, time_left=time_left
+        )
+        self._empty = GOAL_CARD_TODAY_EMPTY.render(date=date_formatted, time_left=time_left)
+
+    def with_goal(self, goal_text: str) -> str:
+        return self._with_goal.render(goal_text=goal_text)
+
+    def without_goal(self) -> str:
+        return self._empty
+
+    def evening(self, done_count: int) -> str:
+        return EVENING_REMINDER.render(days_with_goals=done_count)
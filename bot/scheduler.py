@@ -1,143 +1,239 @@
 import logging
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from aiogram import Bot
 from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest, TelegramNotFound
 
-from config import REMINDER_TIMES, TIMEZONE
-from database.goals import get_pending_goals_for_date, close_day, get_goal_for_date, get_days_with_completed_goals
-from database.db import get_connection
+from broadcast import Broadcaster, BroadcastMessage
+from config import (
+    REMINDER_TIMES, EVENING_REMINDER_TIME, TIMEZONE,
+    OUTBOX_CLAIM_SIZE, BROADCAST_RESUME_GRACE_MINUTES, OUTBOX_RETENTION_DAYS,
+    METRICS_REFRESH_MINUTES
+)
+from database.aio import (
+    close_day, plan_batch, get_batch, get_unfinished_batches,
+    claim_recipients, mark_outbox, complete_batch, prune_batches, purge_fsm_states,
+    refresh_day_metrics
+)
 from keyboards.goal_actions import goal_actions_kb, set_goal_kb_tomorrow
-from texts import MSG_REMINDER_WITH_GOAL, MSG_GOAL_CARD_TODAY, MSG_GOAL_CARD_TODAY_EMPTY, STATUS_PENDING, MSG_EVENING_REMINDER
+from rendering import ReminderRenderer
+from admins import sync_admin_commands
 
 logger = logging.getLogger(__name__)
 
-MONTHS_RU = {
-    1: "января", 2: "февраля", 3: "марта", 4: "апреля",
-    5: "мая", 6: "июня", 7: "июля", 8: "августа",
-    9: "сентября", 10: "октября", 11: "ноября", 12: "декабря"
+
+def reminder_message(renderer: ReminderRenderer, recipient) -> BroadcastMessage:
+    if recipient.goal_id:
+        return BroadcastMessage(
+            recipient.user_id,
+            renderer.with_goal(recipient.goal_text),
+            reply_markup=goal_actions_kb(recipient.goal_id),
+            parse_mode=ParseMode.MARKDOWN_V2
+        )
+    return BroadcastMessage(recipient.user_id, renderer.without_goal(), parse_mode=ParseMode.MARKDOWN_V2)
+
+
+def evening_reminder_message(renderer: ReminderRenderer, recipient) -> BroadcastMessage:
+    return BroadcastMessage(
+        recipient.user_id,
+        renderer.evening(recipient.done_count),
+        reply_markup=set_goal_kb_tomorrow(),
+        parse_mode=ParseMode.MARKDOWN_V2
+    )
+
+
+# kind -> (goal date offset in days, only users without a goal, message builder)
+BROADCAST_KINDS = {
+    "reminder": (0, False, reminder_message),
+    "evening": (1, True, evening_reminder_message),
 }
 
+# Batch ids being drained by this process
+_running_batches = set()
+
+
+def get_slots() -> list[tuple[str, str]]:
+    """(kind, HH:MM) of every scheduled broadcast"""
+    slots = [("reminder", time_str) for time_str in REMINDER_TIMES]
+    slots.append(("evening", EVENING_REMINDER_TIME))
+    return slots
+
+
+def scheduler_now() -> datetime:
+    """Current time in TIMEZONE, the zone the cron jobs fire in.
+
+    Only for comparing with slot times; dates (goal_date, "today") follow
+    the host clock everywhere, as in the handlers.
+    """
+    return datetime.now(ZoneInfo(TIMEZONE))
+
 
-def format_date_ru(d: date) -> str:
-    return f"{d.day} {MONTHS_RU[d.month]}"
+def slot_key(kind: str, day: date, time_str: str) -> str:
+    return f"{kind}:{day.isoformat()} {time_str}"
 
 
-def escape_md(text: str) -> str:
-    """Escape special characters for MarkdownV2"""
-    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    for char in special_chars:
-        text = text.replace(char, f'\\{char}')
-    return text
+# Errors that mean the user cannot receive messages, anything else a bad
+# request may report (unparsable entities, text too long) is the bot's fault
+_USER_ERRORS = ("chat not found", "user is deactivated")
 
 
-def get_time_until_midnight() -> str:
-    now = datetime.now()
-    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
-    delta = midnight - now
+def delivery_status(error) -> str:
+    """Outbox status for a send result, see users.record_deliveries"""
+    if error is None:
+        return "sent"
+    if isinstance(error, TelegramForbiddenError):
+        # Bot blocked, user deactivated or kicked
+        return "blocked"
+    if isinstance(error, (TelegramBadRequest, TelegramNotFound)):
+        message = str(error).lower()
+        if any(user_error in message for user_error in _USER_ERRORS):
+            return "rejected"
+    # Network, server and message errors say nothing about the user
+    return "failed"
 
-    hours, remainder = divmod(delta.seconds, 3600)
-    minutes, _ = divmod(remainder, 60)
 
-    return f"{hours} ч {minutes} мин"
+class OutboxRecorder:
+    """Collects send results and writes them to the outbox in batches"""
 
+    def __init__(self, batch_id: int):
+        self.batch_id = batch_id
+        self._results = []
 
-async def send_reminders(bot: Bot):
-    today = date.today()
+    async def record(self, message: BroadcastMessage, error):
+        self._results.append((message.chat_id, delivery_status(error)))
+        if len(self._results) >= OUTBOX_CLAIM_SIZE:
+            await self.flush()
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id FROM users")
-    users = cursor.fetchall()
-    conn.close()
+    async def flush(self):
+        results, self._results = self._results, []
+        if results:
+            await mark_outbox(self.batch_id, results)
 
-    for (user_id,) in users:
-        goal = get_goal_for_date(user_id, today)
 
+async def outbox_messages(batch_id: int, kind: str, goal_date: date):
+    _, without_goal, build_message = BROADCAST_KINDS[kind]
+    after_user_id = 0
+
+    while True:
+        recipients, after_user_id = await claim_recipients(
+            batch_id, goal_date, without_goal, after_user_id, OUTBOX_CLAIM_SIZE
+        )
+        if after_user_id is None:
+            return
+        # Shared fragments once per page, time left stays accurate to the minute
+        renderer = ReminderRenderer(goal_date)
+        for recipient in recipients:
+            yield build_message(renderer, recipient)
+
+
+async def drain_batch(broadcaster: Broadcaster, batch_id: int, slot: str, kind: str, goal_date: date):
+    if batch_id in _running_batches:
+        return
+    _running_batches.add(batch_id)
+
+    try:
+        recorder = OutboxRecorder(batch_id)
         try:
-            if goal:
-                if goal[4] != "done":  # status is not done
-                    goal_id = goal[0]
-                    goal_text = goal[3]
-                    card = MSG_GOAL_CARD_TODAY.format(
-                        date=escape_md(format_date_ru(today)),
-                        goal_text=escape_md(goal_text),
-                        status=STATUS_PENDING,
-                        time_left=get_time_until_midnight()
-                    ).strip()
-                    await bot.send_message(
-                        user_id,
-                        f"{MSG_REMINDER_WITH_GOAL}\n\n{card}",
-                        reply_markup=goal_actions_kb(goal_id),
-                        parse_mode=ParseMode.MARKDOWN_V2
-                    )
-            else:
-                card = MSG_GOAL_CARD_TODAY_EMPTY.format(
-                    date=escape_md(format_date_ru(today)),
-                    time_left=get_time_until_midnight()
-                )
-                await bot.send_message(user_id, card, parse_mode=ParseMode.MARKDOWN_V2)
-        except Exception as e:
-            logger.error(f"Failed to send reminder to {user_id}: {e}")
+            await broadcaster.run(slot, outbox_messages(batch_id, kind, goal_date), on_result=recorder.record)
+        finally:
+            await recorder.flush()
+        await complete_batch(batch_id)
+    finally:
+        _running_batches.discard(batch_id)
+
+
+async def run_slot(broadcaster: Broadcaster, kind: str, time_str: str, day: date = None):
+    """Plan the slot's batch (once) and send it"""
+    day = day or date.today()
+    offset, without_goal, _ = BROADCAST_KINDS[kind]
+    goal_date = day + timedelta(days=offset)
+    slot = slot_key(kind, day, time_str)
+
+    batch_id = await plan_batch(slot, kind, goal_date, without_goal)
+    if batch_id is None:
+        # Already planned: finished, or being resumed
+        batch = await get_batch(slot)
+        if batch[5] is not None:
+            return
+        batch_id = batch[0]
+
+    await drain_batch(broadcaster, batch_id, slot, kind, goal_date)
+
+
+async def send_reminders(broadcaster: Broadcaster, time_str: str):
+    await run_slot(broadcaster, "reminder", time_str)
+
+
+async def send_evening_reminder(broadcaster: Broadcaster, time_str: str):
+    """Send reminder at 23:00 to set goal for tomorrow"""
+    await run_slot(broadcaster, "evening", time_str)
+
+
+async def resume_broadcasts(broadcaster: Broadcaster):
+    """Finish batches interrupted by a restart and send slots missed while down"""
+    now = scheduler_now()
+    grace = timedelta(minutes=BROADCAST_RESUME_GRACE_MINUTES)
+
+    for batch_id, slot, kind, goal_date, planned_at, _ in await get_unfinished_batches():
+        # planned_at is the host's local time
+        if datetime.fromisoformat(planned_at).astimezone() < now - grace:
+            await complete_batch(batch_id, expire_pending=True)
+            logger.warning(f"Broadcast {slot} expired unfinished")
+            continue
+        logger.info(f"Resuming broadcast {slot}")
+        await drain_batch(broadcaster, batch_id, slot, kind, date.fromisoformat(goal_date))
+
+    for kind, time_str in get_slots():
+        hour, minute = map(int, time_str.split(":"))
+        fire_at = datetime.combine(now.date(), time(hour, minute), tzinfo=now.tzinfo)
+        if not now - grace <= fire_at <= now:
+            continue
+        # Dates are the host's, like date.today() when the job fires on time
+        day = fire_at.astimezone().date()
+        if await get_batch(slot_key(kind, day, time_str)) is None:
+            logger.info(f"Catching up missed broadcast {kind} {time_str}")
+            await run_slot(broadcaster, kind, time_str, day)
 
 
 async def close_day_job():
     yesterday = date.today() - timedelta(days=1)
-    close_day(yesterday)
+    await close_day(yesterday)
     logger.info(f"Day closed: {yesterday}")
 
+    await prune_batches(OUTBOX_RETENTION_DAYS)
 
-async def send_evening_reminder(bot: Bot):
-    """Send reminder at 23:00 to set goal for tomorrow"""
-    tomorrow = date.today() + timedelta(days=1)
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id FROM users")
-    users = cursor.fetchall()
-    conn.close()
+async def refresh_metrics_job():
+    await refresh_day_metrics(date.today())
 
-    for (user_id,) in users:
-        # Check if user already has goal for tomorrow
-        goal = get_goal_for_date(user_id, tomorrow)
-        if goal:
-            continue  # Skip if already has goal for tomorrow
 
-        try:
-            days_with_goals = get_days_with_completed_goals(user_id)
-            message = MSG_EVENING_REMINDER.format(days_with_goals=days_with_goals)
-            await bot.send_message(
-                user_id,
-                message,
-                reply_markup=set_goal_kb_tomorrow(),
-                parse_mode=ParseMode.MARKDOWN_V2
-            )
-        except Exception as e:
-            logger.error(f"Failed to send evening reminder to {user_id}: {e}")
+async def purge_fsm_job():
+    count = await purge_fsm_states()
+    if count:
+        logger.info(f"Purged {count} expired FSM states")
 
 
 def setup_scheduler(bot: Bot) -> AsyncIOScheduler:
     scheduler = AsyncIOScheduler(timezone=TIMEZONE)
+    broadcaster = Broadcaster(bot)
 
-    # Reminders
-    for time_str in REMINDER_TIMES:
+    # Reminders at REMINDER_TIMES, evening reminder at 23:01 (after regular reminder)
+    for kind, time_str in get_slots():
         hour, minute = map(int, time_str.split(":"))
         scheduler.add_job(
-            send_reminders,
+            send_evening_reminder if kind == "evening" else send_reminders,
             "cron",
             hour=hour,
             minute=minute,
-            args=[bot]
+            args=[broadcaster, time_str],
+            misfire_grace_time=BROADCAST_RESUME_GRACE_MINUTES * 60,
+            coalesce=True
         )
 
-    # Evening reminder at 23:01 (after regular reminder)
-    scheduler.add_job(
-        send_evening_reminder,
-        "cron",
-        hour=23,
-        minute=1,
-        args=[bot]
-    )
+    # Resume interrupted broadcasts once the scheduler starts
+    scheduler.add_job(resume_broadcasts, args=[broadcaster])
 
     # Close day at 00:01
     scheduler.add_job(
@@ -147,4 +243,27 @@ def setup_scheduler(bot: Bot) -> AsyncIOScheduler:
         minute=1
     )
 
+    # Keep today's admin metrics current, starting now
+    scheduler.add_job(refresh_metrics_job)
+    scheduler.add_job(
+        refresh_metrics_job,
+        "interval",
+        minutes=METRICS_REFRESH_MINUTES
+    )
+
+    # Drop abandoned dialogs every hour
+    scheduler.add_job(
+        purge_fsm_job,
+        "cron",
+        minute=30
+    )
+
+    # Pick up edits of the admin list
+    scheduler.add_job(
+        sync_admin_commands,
+        "interval",
+        minutes=1,
+        args=[bot]
+    )
+
     return scheduler
@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+
+import pytest
+
+# Modules are imported as top-level names, like when the bot runs from bot/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh migrated database for the test"""
+    from database import db as database_db
+    from database import cache
+
+    monkeypatch.setattr(database_db, "DB_PATH", tmp_path / "test.db")
+    monkeypatch.setattr(cache, "_users", type(cache._users)())
+    database_db.init_db()
+    yield database_db
+    database_db.close_connections()
+
+
+@pytest.fixture
+def local_timezone(monkeypatch):
+    """Run the test with the process in a fixed non-UTC timezone (UTC+3)"""
+    monkeypatch.setenv("TZ", "Europe/Moscow")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
@@ -0,0 +1,33 @@
+from datetime import date
+
+from database import cache
+from database.goals import create_goal, get_goal_view_for_date
+from database.users import get_or_create_user
+
+
+def _edit_from_other_worker(db, goal_id, text):
+    # A write that does not go through this process's invalidation
+    with db.transaction() as cursor:
+        cursor.execute("UPDATE goals SET goal_text = ? WHERE id = ?", (text, goal_id))
+
+
+def test_cache_is_off_by_default(db):
+    get_or_create_user(1)
+    goal = create_goal(1, date(2026, 3, 1), "first")
+    get_goal_view_for_date(1, goal.goal_date)
+
+    _edit_from_other_worker(db, goal.id, "changed")
+    assert get_goal_view_for_date(1, goal.goal_date).goal_text == "changed"
+
+
+def test_cached_goal_expires_after_ttl(db, monkeypatch):
+    monkeypatch.setattr(cache, "USER_CACHE_TTL", 60)
+    get_or_create_user(1)
+    goal = create_goal(1, date(2026, 3, 1), "first")
+    get_goal_view_for_date(1, goal.goal_date)
+
+    _edit_from_other_worker(db, goal.id, "changed")
+    assert get_goal_view_for_date(1, goal.goal_date).goal_text == "first"
+
+    cache._users[1].expires = 0
+    assert get_goal_view_for_date(1, goal.goal_date).goal_text == "changed"
@@ -0,0 +1,20 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+
+import pytest
+
+import charts
+
+
+def test_broken_pool_is_dropped(monkeypatch):
+    # A worker that dies at start, as a crashing initializer would
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"), initializer=os.abort)
+    monkeypatch.setattr(charts, "_pool", pool)
+
+    with pytest.raises(BrokenProcessPool):
+        asyncio.run(charts.activity_chart(date(2026, 3, 1), date(2026, 3, 2), [("2026-03-01", 1, 1)]))
+    assert charts._pool is None
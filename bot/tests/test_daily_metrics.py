@@ -0,0 +1,62 @@
+from datetime import date
+
+from database.daily_metrics import rollup_day, get_bot_stats
+from database.goals import create_goal, delete_goal
+from database.user_stats import backfill_user_stats
+
+
+def _add_user(db, user_id, first_seen_at):
+    with db.transaction() as cursor:
+        cursor.execute(
+            "INSERT INTO users (user_id, first_seen_at) VALUES (?, ?)",
+            (user_id, first_seen_at)
+        )
+
+
+def _new_users(db, day):
+    with db.transaction() as cursor:
+        rollup_day(cursor, day)
+    return db.get_connection().execute(
+        "SELECT new_users FROM daily_metrics WHERE metric_date = ?", (day.isoformat(),)
+    ).fetchone()[0]
+
+
+def test_user_after_local_midnight_counts_on_local_day(db, local_timezone):
+    # 01:30 on March 10th in UTC+3, stored in UTC as CURRENT_TIMESTAMP does
+    _add_user(db, 1, "2026-03-09 22:30:00")
+    # 23:30 on March 9th local time
+    _add_user(db, 2, "2026-03-09 20:30:00")
+
+    assert _new_users(db, date(2026, 3, 9)) == 1
+    assert _new_users(db, date(2026, 3, 10)) == 1
+    assert _new_users(db, date(2026, 3, 11)) == 0
+
+
+def test_bot_stats_totals_do_not_depend_on_rollup(db):
+    _add_user(db, 1, "2026-03-09 22:30:00")
+    _add_user(db, 2, "2026-03-10 10:00:00")
+    create_goal(1, date(2030, 1, 1), "future goal")
+    goal = create_goal(2, date(2030, 1, 2), "deleted goal")
+    create_goal(2, date(2030, 1, 3), "kept goal")
+    delete_goal(goal.id)
+
+    stats = get_bot_stats()
+    assert stats["total_users"] == 2
+    assert stats["total_goals"] == 2
+    assert stats["done_goals"] == 0
+
+
+def test_bot_stats_before_user_stats_backfill(db):
+    _add_user(db, 1, "2026-03-10 10:00:00")
+    for day in range(1, 11):
+        create_goal(1, date(2026, 3, day), "goal")
+    # As on a database upgraded from before user_stats
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM user_stats")
+        cursor.execute("UPDATE user_stats_state SET complete = 0")
+
+    assert get_bot_stats()["total_goals"] == 10
+
+    backfill_user_stats()
+    assert db.get_connection().execute("SELECT complete FROM user_stats_state").fetchone()[0] == 1
+    assert get_bot_stats()["total_goals"] == 10
@@ -0,0 +1,39 @@
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+from config import DELIVERY_MAX_FAILURES
+from database.users import get_or_create_user, record_deliveries
+from scheduler import delivery_status
+
+_METHOD = SendMessage(chat_id=1, text="text")
+
+
+def test_parse_error_does_not_count_against_user(db):
+    get_or_create_user(1)
+    error = TelegramBadRequest(method=_METHOD, message="Bad Request: can't parse entities: Character '\\\\' is reserved")
+    assert delivery_status(error) == "failed"
+
+    for _ in range(DELIVERY_MAX_FAILURES + 1):
+        record_deliveries([(1, delivery_status(error))])
+
+    row = db.get_connection().execute(
+        "SELECT is_blocked, failed_deliveries FROM users WHERE user_id = 1"
+    ).fetchone()
+    assert tuple(row) == (0, 0)
+
+
+def test_user_errors_count_towards_blocking(db):
+    get_or_create_user(1)
+    error = TelegramBadRequest(method=_METHOD, message="Bad Request: chat not found")
+    assert delivery_status(error) == "rejected"
+
+    for _ in range(DELIVERY_MAX_FAILURES):
+        record_deliveries([(1, delivery_status(error))])
+
+    row = db.get_connection().execute("SELECT is_blocked FROM users WHERE user_id = 1").fetchone()
+    assert row[0] == 1
+
+
+def test_forbidden_blocks_at_once():
+    error = TelegramForbiddenError(method=_METHOD, message="Forbidden: bot was blocked by the user")
+    assert delivery_status(error) == "blocked"
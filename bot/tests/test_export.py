@@ -0,0 +1,32 @@
+import csv
+import gzip
+from datetime import date
+
+from database.export import export_goal_changes
+from database.goals import create_goal, update_goal_text
+from database.users import get_or_create_user
+
+
+def _read(path):
+    with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_goals_from_before_tracking_export_by_id(db, tmp_path):
+    get_or_create_user(1)
+    first = create_goal(1, date(2026, 3, 1), "first")
+    second = create_goal(1, date(2026, 3, 2), "second")
+    # As left by the migration: no change_seq on existing goals
+    with db.transaction() as cursor:
+        cursor.execute("UPDATE goals SET change_seq = NULL, updated_at = NULL")
+
+    (changed, _), watermark = export_goal_changes(tmp_path, 0)
+    rows = _read(changed)
+    assert [(row["id"], row["change_seq"]) for row in rows] == [(str(first.id), str(first.id)), (str(second.id), str(second.id))]
+    assert all(row["updated_at"] for row in rows)
+
+    update_goal_text(first.id, "edited")
+    (changed, _), _ = export_goal_changes(tmp_path, watermark)
+    rows = _read(changed)
+    assert [(row["id"], row["goal_text"]) for row in rows] == [(str(first.id), "edited")]
+    assert int(rows[0]["change_seq"]) > watermark
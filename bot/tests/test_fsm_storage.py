@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+
+import fsm_storage
+from database import fsm
+
+
+def _sync(func):
+    async def call(*args):
+        return func(*args)
+    return call
+
+
+def test_write_is_not_skipped_on_stale_cache(db, monkeypatch):
+    # The database functions run inline instead of on the executor thread
+    for name in ("get_fsm_record", "set_fsm_state", "set_fsm_data"):
+        monkeypatch.setattr(fsm_storage, name, _sync(getattr(fsm, name)))
+
+    key = StorageKey(bot_id=1, chat_id=1, user_id=1)
+    # Two workers sharing the database, with the cache enabled
+    first = fsm_storage.SQLiteStorage(cache_ttl=60)
+    second = fsm_storage.SQLiteStorage(cache_ttl=60)
+
+    async def run():
+        await first.set_state(key, "waiting")
+        assert await second.get_state(key) == "waiting"
+        await first.set_state(key, None)
+        # Equal to the second worker's stale cached state, must still be written
+        await second.set_state(key, "waiting")
+        return await fsm_storage.SQLiteStorage(cache_ttl=0).get_state(key)
+
+    assert asyncio.run(run()) == "waiting"
+
+
+def test_expired_state_does_not_return_with_new_data(db):
+    fsm.set_fsm_state("key", "GoalStates:waiting_for_goal", 1.0)
+    # Expired but not purged yet
+    fsm.set_fsm_data("key", '{"search_query":"книга"}', time.time() + 60)
+
+    assert fsm.get_fsm_record("key") == (None, '{"search_query":"книга"}')
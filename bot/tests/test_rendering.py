@@ -0,0 +1,6 @@
+from rendering import escape_md
+
+
+def test_escape_md_escapes_reserved_characters_and_backslash():
+    assert escape_md("Цель: 1.5 км (бег) \\ отдых!") == "Цель: 1\\.5 км \\(бег\\) \\\\ отдых\\!"
+    assert escape_md("Прочитать книгу") == "Прочитать книгу"
@@ -0,0 +1,37 @@
+import asyncio
+import time
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import scheduler
+from config import TIMEZONE
+
+
+def test_missed_slot_is_caught_up_on_the_host_date(monkeypatch):
+    # Host a day ahead of TIMEZONE late in the evening
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    monkeypatch.setattr(scheduler, "scheduler_now", lambda: datetime(2026, 3, 10, 23, 20, tzinfo=ZoneInfo(TIMEZONE)))
+
+    async def no_batches():
+        return []
+
+    async def missing_batch(slot):
+        return None
+
+    ran = []
+
+    async def run_slot(broadcaster, kind, time_str, day=None):
+        ran.append((kind, time_str, day))
+
+    monkeypatch.setattr(scheduler, "get_unfinished_batches", no_batches)
+    monkeypatch.setattr(scheduler, "get_batch", missing_batch)
+    monkeypatch.setattr(scheduler, "run_slot", run_slot)
+    try:
+        asyncio.run(scheduler.resume_broadcasts(None))
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    # 23:00 in Moscow is 05:00 on the next day in Tokyo, what date.today() gave then
+    assert ran == [("reminder", "23:00", date(2026, 3, 11)), ("evening", "23:01", date(2026, 3, 11))]
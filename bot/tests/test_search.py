@@ -0,0 +1,61 @@
+from datetime import date
+
+from database import search
+from database.goals import add_reflection, create_goal, delete_goal, update_goal_text
+from database.migrations import MIGRATIONS, migrate
+from database.users import get_or_create_user
+
+_SEARCH_VERSION = [description for description, _ in MIGRATIONS].index("goal search") + 1
+
+
+def _migrate_with_existing_goals(db):
+    """Take the database back to before the goal search migration, the
+    goals already there, and migrate it again"""
+    with db.transaction() as cursor:
+        for trigger in ("goals_fts_insert", "goals_fts_delete", "goals_fts_update"):
+            cursor.execute(f"DROP TRIGGER {trigger}")
+        cursor.execute("DROP TABLE goals_fts")
+        cursor.execute("DROP VIEW goals_fts_source")
+        cursor.execute("DROP TABLE search_index_state")
+        cursor.execute(f"PRAGMA user_version = {_SEARCH_VERSION - 1}")
+    migrate()
+
+
+def test_search_before_and_after_index_build(db, monkeypatch):
+    get_or_create_user(1)
+    get_or_create_user(2)
+    create_goal(1, date(2026, 3, 1), "Прочитать книгу")
+    create_goal(1, date(2026, 3, 2), "Написать код")
+    create_goal(2, date(2026, 3, 1), "Прочитать статью")
+    _migrate_with_existing_goals(db)
+    monkeypatch.setattr(search, "_index_built", False)
+
+    hits, has_more = search.search_goals(1, "прочитать")
+    assert [hit.goal_text for hit in hits] == ["Прочитать книгу"]
+    assert not has_more
+
+    search.rebuild_search_index()
+    hits, _ = search.search_goals(1, "прочит")
+    assert [hit.goal_id for hit in hits] == [1]
+    assert search.MARK_START in hits[0].goal_text
+
+
+def test_existing_goals_can_change_before_index_build(db, monkeypatch):
+    get_or_create_user(1)
+    first = create_goal(1, date(2026, 3, 1), "Прочитать книгу")
+    second = create_goal(1, date(2026, 3, 2), "Написать код")
+    third = create_goal(1, date(2026, 3, 3), "Сделать зарядку")
+    _migrate_with_existing_goals(db)
+    monkeypatch.setattr(search, "_index_built", False)
+
+    update_goal_text(first.id, "Прочитать две книги")
+    add_reflection(first.id, "Понравилось")
+    delete_goal(second.id)
+    create_goal(1, date(2026, 3, 3), "Пробежать 5 км")
+
+    search.rebuild_search_index()
+    connection = db.get_connection()
+    connection.execute("INSERT INTO goals_fts (goals_fts, rank) VALUES ('integrity-check', 1)")
+    assert [hit.goal_id for hit in search.search_goals(1, "книги")[0]] == [first.id]
+    assert [hit.goal_id for hit in search.search_goals(1, "пробежать")[0]] == [third.id]
+    assert search.search_goals(1, "код") == ([], False)
@@ -43,6 +43,7 @@ MSG_GOAL_DELETED = "🗑 Цель удалена."
 MSG_GOAL_EDITED = "✏ Цель изменена."
 MSG_CANNOT_EDIT_DONE = "❌ Нельзя редактировать выполненную цель."
 MSG_GOAL_LOCKED = "🔒 Цель закрыта для редактирования."
+MSG_THROTTLED = "⏳ Слишком часто, подожди немного."
 
 # Stats
 MSG_STATS = """📊 СТАТИСТИКА
@@ -219,6 +220,7 @@ MSG_WISHES_CTA = "\n\nНажми на кнопку ➕ <b>Создать нов
 MSG_ENTER_WISH = "Напиши своё «хочу»:"
 MSG_WISH_CREATED = "✅ «Хочу» создано!"
 MSG_WISH_LIMIT = "❌ У тебя уже 2 активных «хочу». Деактивируй или архивируй одно из них."
+MSG_WISH_NOT_FOUND = "«Хочу» не найдено"
 MSG_WISH_UPDATED = "✅ «Хочу» обновлено!"
 MSG_WISH_DELETED = "🗑 «Хочу» удалено."
 MSG_WISH_ACTIVATED = "▶️ «Хочу» активировано!"
@@ -246,6 +248,7 @@ MSG_HELP = """📖 <b>Основные команды:</b>
 /start — Запустить бота
 /wants — Мои хочу (долгосрочные цели)
 /stats — Личная статистика
+/search — Поиск по целям и мыслям
 /help — Показать эту справку
 
 <b>Кнопки главного меню:</b>
@@ -257,18 +260,35 @@ MSG_HELP_ADMIN = """
 <b>Админ-команды:</b>
 /admin_stats — Статистика бота
 /admin_export — Экспорт данных (CSV)
+/admin_export N — Цели, изменённые после отметки N
 /admin_metric — График активности"""
+MSG_EXPORT_WATERMARK = "Новая отметка: <code>{watermark}</code>\nДля следующей выгрузки: /admin_export {watermark}"
+MSG_EXPORT_BAD_WATERMARK = "❌ Отметка должна быть целым числом: /admin_export N"
 MSG_REFLECTION_SAVED = "✅ Записано!"
 MSG_REFLECTION_SKIPPED = "👌 Хорошо, продолжай в том же духе!"
 
 # History / Diary
 MSG_WISH_HISTORY_EMPTY = "📖 История пуста. Выполняй цели, привязанные к этому «хочу»!"
 MSG_WISH_HISTORY_TITLE = "📖 <b>История: {wish_text}</b>\n"
+BTN_HISTORY_NEWER = "⬅️ Новее"
+BTN_HISTORY_OLDER = "Раньше ➡️"
 MSG_HISTORY_ITEM = """
 📅 {date}
 🎯 {goal_text}
 {reflection}"""
 
+# Search
+BTN_SEARCH_PREV = "⬅️ Назад"
+BTN_SEARCH_NEXT = "Дальше ➡️"
+MSG_SEARCH_USAGE = "🔍 Напиши, что искать, после команды:\n/search пробежка"
+MSG_SEARCH_EMPTY = "🔍 Ничего не найдено"
+MSG_SEARCH_EXPIRED = "Поиск устарел, повтори команду /search"
+MSG_SEARCH_TITLE = "🔍 <b>Поиск: {query}</b> (стр. {page})\n"
+MSG_SEARCH_ITEM = """
+📅 {date} {status}
+🎯 {goal_text}
+{reflection}"""
+
 # Families (Paths)
 BTN_PATHS = "🛤 Пути"
 BTN_CREATE_PATH = "➕ Создать путь"
@@ -277,6 +297,7 @@ MSG_PATHS_INTRO = """🛤 <b>Пути</b>
 
 Путь — это группа связанных «хочу»."""
 MSG_PATHS_EMPTY = "У тебя пока нет путей."
+MSG_PATH_LINE = "🛤 <b>{name}</b> ({wishes} хочу, ✅ {done})\n"
 MSG_ENTER_PATH_NAME = "Введи название пути:"
 MSG_PATH_CREATED = "✅ Путь создан!"
 MSG_PATH_DELETED = "🗑 Путь удалён."
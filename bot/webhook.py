@@ -0,0 +1,122 @@
+"""Webhook mode: updates are POSTed by Telegram to an embedded aiohttp server.
+
+Updates are acknowledged at once and processed in the background, at most
+WEBHOOK_CONCURRENCY at a time. When all slots are busy the next request
+waits, so Telegram slows down instead of the bot queueing without bound.
+"""
+import asyncio
+import logging
+import signal
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_CONCURRENCY, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_SHUTDOWN_TIMEOUT
+)
+from database import cache as db_cache
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = "/healthz"
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, concurrency: int = WEBHOOK_CONCURRENCY, **kwargs):
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+        self._slots = asyncio.Semaphore(concurrency)
+        self.processed = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        await self._slots.acquire()
+        try:
+            response = await super()._handle_request_background(bot, request)
+        except BaseException:
+            self._slots.release()
+            raise
+        return response
+
+    async def _background_feed_update(self, bot: Bot, update: dict) -> None:
+        try:
+            await super()._background_feed_update(bot, update)
+        finally:
+            self.processed += 1
+            self._slots.release()
+
+    async def close(self) -> None:
+        # Let in-flight updates finish before the session is closed
+        tasks = set(self._background_feed_update_tasks)
+        if tasks:
+            logger.info(f"Waiting for {len(tasks)} updates to finish")
+            _, pending = await asyncio.wait(tasks, timeout=WEBHOOK_SHUTDOWN_TIMEOUT)
+            if pending:
+                logger.warning(f"Cancelling {len(pending)} updates still running")
+                for task in pending:
+                    task.cancel()
+        await super().close()
+
+
+def check_config():
+    """Refuse a public webhook without a secret: anyone who finds the path
+    could post forged updates, admin ids included"""
+    if WEBHOOK_URL and not WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_SECRET must be set when WEBHOOK_URL is")
+
+
+def create_app(dp: Dispatcher, bot: Bot) -> web.Application:
+    app = web.Application()
+    handler = BoundedRequestHandler(dp, bot, secret_token=WEBHOOK_SECRET or None)
+    handler.register(app, path=WEBHOOK_PATH)
+
+    async def health(request: web.Request) -> web.Response:
+        user_locks = dp.workflow_data.get("user_locks")
+        throttling = dp.workflow_data.get("throttling")
+        return web.json_response({
+            "status": "ok",
+            "in_flight": handler.in_flight,
+            "processed": handler.processed,
+            "user_queues": user_locks.metrics() if user_locks else None,
+            "throttling": throttling.metrics() if throttling else None,
+            "db_cache": db_cache.metrics()
+        })
+
+    app.router.add_get(HEALTH_PATH, health)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Serve the webhook until SIGINT or SIGTERM"""
+    runner = web.AppRunner(create_app(dp, bot))
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    # Without a public URL the server only takes local (benchmark) traffic
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET or None,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        logger.info("Webhook registered")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Webhook server stopping")
+        # Stops accepting requests, then runs the shutdown hooks
+        await runner.cleanup()